@@ -0,0 +1,15 @@
+"""Helpers comuni pentru scripturile din bench/.
+
+main.py cere BOT_TOKEN la import și folosește căi relative la directorul curent,
+așa că scripturile importă botul dintr-un director de lucru separat.
+"""
+import os, sys, pathlib, tempfile
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+def import_main(workdir: str | None = None):
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCH-TOKEN")
+    os.chdir(workdir or tempfile.mkdtemp(prefix="bench-"))
+    if str(ROOT) not in sys.path: sys.path.insert(0, str(ROOT))
+    import main
+    return main
@@ -0,0 +1,153 @@
+"""Benchmark pentru căile calde ale CRM-ului CSV, pe date sintetice.
+
+    python bench/bench_crm.py [--sizes 10000,100000,1000000] [--out bench_crm.json] [--compare baseline.json]
+
+Pentru fiecare mărime N se generează orders_log.csv (N cereri, cronologic, coloanele din
+FIELDNAMES) și earnings_log.csv (N/2 rânduri, ~1/3 ADMIN, coloanele din EARN_FIELDS), apoi,
+într-un proces separat (memorie curată), se măsoară:
+  load_log (rece), get_order, update_order, log_order, dev_totals / admin_totals (rece + cald),
+  export_month și export_admin (handler-ele, cu un Message stub).
+Timpul e cel mai bun din `--repeat` rulări fără tracemalloc; vârful de memorie vine dintr-o
+rulare separată cu tracemalloc. Rezultatele se scriu în JSON; cu --compare se afișează
+raportul față de o rulare anterioară. Merge pe backend-ul din STORAGE_BACKEND (cu sqlite,
+CSV-urile generate sunt importate cu import_csv_to_sqlite); „rece” = backend nou, prin
+make_backend(), fără acces la structurile interne ale unui backend anume.
+"""
+import argparse, asyncio, csv, datetime, json, os, platform, random, subprocess, sys, time, tracemalloc
+from types import SimpleNamespace
+from _common import ROOT, import_main
+
+START = datetime.datetime(2023, 1, 1)
+SPAN_DAYS = 730
+STATUSES = ["nou"] * 2 + ["in_lucru"] * 2 + ["finalizat"] + ["finalizat_confirmat"] * 4 + ["anulat"]
+
+def ts_at(i, n):
+    return (START + datetime.timedelta(seconds=SPAN_DAYS * 86400 * i / max(n, 1))).isoformat(timespec="seconds")
+
+def gen_orders(m, path, n, rnd):
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f); w.writerow(m.FIELDNAMES)
+        for i in range(n):
+            devs = rnd.sample(range(1000, 1050), rnd.choice((0, 1, 1, 2)))
+            roles = ";".join(f"{d}:{'lead' if j == 0 else 'helper'}:{100 if j == 0 else 0}" for j, d in enumerate(devs))
+            row = {
+                "ts": ts_at(i, n), "req_id": f"{i:08X}", "user_id": str(rnd.randrange(10**6, 10**9)),
+                "username": f"user{i}", "full_name": f"User {i}", "category": "🤖 Programare",
+                "title": f"Comanda {i}", "desc": "Descriere scurtă a comenzii, câteva cuvinte.",
+                "budget_raw": f"{rnd.randrange(100, 5000)} {rnd.choice(('MDL', 'EUR', 'USD'))}",
+                "deadline": "10 zile", "deadline_iso": "", "contact": f"@user{i}",
+                "status": rnd.choice(STATUSES), "assigned_dev_ids": ",".join(map(str, devs)),
+                "started_ts": "", "notes": "", "topic_id": "", "topic_link": "", "roles": roles,
+            }
+            w.writerow([row[k] for k in m.FIELDNAMES])
+
+def gen_earnings(m, path, n, rnd):
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f); w.writerow(m.EARN_FIELDS)
+        for i in range(n):
+            dev = "ADMIN" if i % 3 == 0 else str(rnd.randrange(1000, 1050))
+            row = {"ts": ts_at(i, n), "req_id": f"{rnd.randrange(n * 2):08X}", "dev_id": dev,
+                   "dev_username": "" if dev == "ADMIN" else f"dev{dev}", "amount": f"{rnd.uniform(5, 500):.2f}",
+                   "currency": rnd.choice(("MDL", "EUR", "USD")), "note": "payout"}
+            w.writerow([row[k] for k in m.EARN_FIELDS])
+
+def measure(fn, setup=None, repeat=3, ops=1):
+    """(cel mai bun timp, vârf tracemalloc) pentru fn(); setup() rulează înainte de fiecare rulare."""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup: setup()
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    if setup: setup()
+    tracemalloc.start()
+    try:
+        fn(); _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time_s": round(best, 6), "per_op_us": round(best / ops * 1e6, 3), "ops": ops, "peak_mib": round(peak / 2**20, 3)}
+
+def fresh_store(m):
+    """Backend nou (index și ledger reci); WRITER și on_change legate de el, ca la pornire."""
+    m.STORE = m.make_backend()
+    m.STORE.on_change = m.foreign_changes
+    m.WRITER = m.OrderWriter(m.STORE)
+
+def run_size(n, repeat):
+    m = import_main()
+    rnd = random.Random(n)
+    gen_orders(m, m.LOG_PATH, n, rnd)
+    gen_earnings(m, m.EARN_PATH, n // 2, rnd)
+    if m.STORE.name == "sqlite": m.import_csv_to_sqlite()
+    uid = 424242; m.ROLES["OWNER"].add(uid)
+    res = {}
+
+    res["load_log"] = measure(m.load_log, lambda: fresh_store(m), repeat)
+
+    ids = rnd.sample([r["req_id"] for r in m.load_log()], min(10_000, n))
+    res["get_order"] = measure(lambda: [m.get_order(r) for r in ids], repeat=repeat, ops=len(ids))
+    upd = ids[:200]   # sincron: fiecare update face append + fsync, ca botul fără OrderWriter
+    res["update_order"] = measure(lambda: [m.update_order(r, notes="bench") for r in upd], repeat=1, ops=len(upd))
+    seq = iter(range(10**9))
+    def insert_batch():
+        for _ in range(200):
+            k = next(seq)
+            m.log_order({"ts": m.now_iso(), "req_id": f"B{k:07d}", "user_id": "1", "status": "nou"})
+    res["log_order"] = measure(insert_batch, repeat=1, ops=200)
+
+    devs = [str(d) for d in range(1000, 1050)]
+    res["dev_totals_cold"] = measure(lambda: m.dev_totals(devs[0]), lambda: fresh_store(m), repeat)
+    res["dev_totals"] = measure(lambda: [m.dev_totals(d) for d in devs * 20], repeat=repeat, ops=len(devs) * 20)
+    res["admin_totals_cold"] = measure(lambda: m.admin_totals(30), lambda: fresh_store(m), repeat)
+    res["admin_totals"] = measure(lambda: [m.admin_totals(p) for p in (None, 7, 30, 365) * 25], repeat=repeat, ops=100)
+
+    async def answer(*a, **kw): pass
+    def msg(text): return SimpleNamespace(from_user=SimpleNamespace(id=uid), text=text, answer=answer, answer_document=answer)
+    month = (START + datetime.timedelta(days=SPAN_DAYS // 2)).strftime("%Y-%m")
+    res["export_month"] = measure(lambda: asyncio.run(m.export_month(msg(f"/export_month {month}"))), repeat=repeat)
+    res["export_admin"] = measure(lambda: asyncio.run(m.export_admin(msg("/export_admin"))), repeat=repeat)
+    return res
+
+def git_rev():
+    try: return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError): return ""
+
+def compare(cur, base):
+    print(f"\nfață de {base['meta'].get('commit') or '?'} ({base['meta'].get('date', '')}, "
+          f"{base['meta'].get('backend', 'csv')}): timp nou / timp vechi")
+    for size, ops in cur["results"].items():
+        old = base["results"].get(size)
+        if not old: continue
+        cells = [f"{op} {r['time_s'] / old[op]['time_s']:.2f}x" for op, r in ops.items() if op in old and old[op]["time_s"]]
+        print(f"  {int(size):>9,}: " + " · ".join(cells))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default="bench_crm.json")
+    ap.add_argument("--compare", help="JSON dintr-o rulare anterioară")
+    ap.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:   # o singură mărime, în proces propriu; rezultatul pe ultima linie din stdout
+        print(json.dumps(run_size(args.child, args.repeat))); return
+
+    out = {"meta": {"date": datetime.datetime.now().isoformat(timespec="seconds"), "commit": git_rev(),
+                    "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat,
+                    "backend": os.getenv("STORAGE_BACKEND", "csv").lower()},
+           "results": {}}
+    for n in (int(x) for x in args.sizes.split(",")):
+        t0 = time.perf_counter()
+        p = subprocess.run([sys.executable, __file__, "--child", str(n), "--repeat", str(args.repeat)],
+                           capture_output=True, text=True)
+        if p.returncode:
+            print(p.stderr, file=sys.stderr); raise SystemExit(f"eșec la N={n}")
+        res = out["results"][str(n)] = json.loads(p.stdout.strip().splitlines()[-1])
+        print(f"N={n:,} ({time.perf_counter() - t0:.0f} s)")
+        for op, r in res.items():
+            print(f"  {op:<18} {r['time_s'] * 1000:10.2f} ms  {r['per_op_us']:12.2f} µs/op  vârf {r['peak_mib']:8.2f} MiB")
+    with open(args.out, "w", encoding="utf-8") as f: json.dump(out, f, indent=2)
+    print(f"\nrezultate: {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: compare(out, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Micro-benchmark: costul de randare per callback pentru meniuri (înainte/după CATALOG).
+
+    python bench/bench_keyboards.py [--n 20000]
+
+„înainte” = construcția tastaturii + fallback-ul LANGS la fiecare callback (ca în
+versiunea veche a main_menu_kb/category_kb și a tastaturii de idei); „după” = lookup în CATALOG.
+"""
+import argparse, timeit
+from _common import import_main
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    args = ap.parse_args()
+    m = import_main()
+    uid = 1; pid = "prog_auto"
+    for lang in m.LANGS:
+        m.set_lang(uid, lang)
+        L = m.LANGS[lang]
+        cases = {
+            "main_menu": (lambda: m._build_main_menu(m.get_lang(uid)),
+                          lambda: m.main_menu_kb(uid)),
+            "open_category": (lambda: (
+                                  (lambda cat: f"**{cat['title']}**\n{cat['desc']}\n\n{L.get('examples_header','Examples:')}\n• " + "\n• ".join(cat["examples"]))(
+                                      L["cat"].get(pid) or m.LANGS["ro"]["cat"].get(pid)),
+                                  m._build_category_kb(m.get_lang(uid), pid)),
+                              lambda: (lambda c: (c["text"], c["kb"]))(m.CATALOG[m.get_lang(uid)]["cats"][pid])),
+            "open_ideas": (lambda: m._build_ideas_kb(m.get_lang(uid), pid),
+                           lambda: m.CATALOG[m.get_lang(uid)]["cats"][pid]["ideas_kb"]),
+        }
+        for name, (before, after) in cases.items():
+            tb = timeit.timeit(before, number=args.n) / args.n * 1e6
+            ta = timeit.timeit(after, number=args.n) / args.n * 1e6
+            print(f"{lang} {name:<14} înainte {tb:8.2f} µs   după {ta:6.3f} µs   x{tb / ta:,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Încărcarea preferințelor de limbă (LangStore) la pornire.
+
+    python bench/bench_lang_store.py [--users 300000] [--dup 0.3]
+
+Generează un jurnal cu `--users` useri (plus o fracție `--dup` de schimbări repetate de
+limbă), apoi măsoară: încărcarea jurnalului brut, compactarea, încărcarea după compactare
+(cazul obișnuit la pornire) și căutările bisect.
+"""
+import argparse, random, time, timeit
+from _common import import_main
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=300_000)
+    ap.add_argument("--dup", type=float, default=0.3)
+    args = ap.parse_args()
+    m = import_main()
+    rnd = random.Random(1)
+    codes = [c.encode("ascii") for c in m.LANGS]
+    uids = rnd.sample(range(10**6, 10**10), args.users)
+    recs = [(u, rnd.choice(codes)) for u in uids]
+    recs += [(rnd.choice(uids), rnd.choice(codes)) for _ in range(int(args.users * args.dup))]
+    m.LANG_PATH.write_bytes(b"".join(m.LANG_REC.pack(u, c) for u, c in recs))
+    print(f"jurnal: {len(recs)} înregistrări, {m.LANG_PATH.stat().st_size / 2**20:.1f} MiB")
+
+    store = m.LangStore(m.LANG_PATH)
+    t0 = time.perf_counter(); store.load(); t_raw = time.perf_counter() - t0
+    t0 = time.perf_counter(); store.compact(); t_compact = time.perf_counter() - t0
+    store = m.LangStore(m.LANG_PATH)
+    t0 = time.perf_counter(); store.load(); t_load = time.perf_counter() - t0
+    probe = rnd.sample(uids, 10_000)
+    t_get = timeit.timeit(lambda: [store.lookup(u) for u in probe], number=10) / (10 * len(probe))
+    print(f"load brut {t_raw * 1000:.0f} ms · compact {t_compact * 1000:.0f} ms · load compactat {t_load * 1000:.0f} ms"
+          f" · lookup {t_get * 1e6:.2f} µs · index {(store.uids.itemsize * len(store.uids) + len(store.codes)) / 2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Latența de trimitere a unei comenzi (order_contact) cu un Bot stub.
+
+    python bench/bench_order_contact.py [--n 200] [--latency 0.05] [--concurrency 10]
+
+Fiecare apel Bot API (send_message, create_forum_topic) e înlocuit cu un stub care
+doarme `--latency` secunde. Se măsoară:
+  • client     — până când handler-ul întoarce (clientul are confirmarea + sumarul);
+  • end-to-end — până când topic-ul, salvarea, postarea în grup și DM-ul admin sunt gata.
+Limitele OUTBOX sunt ridicate ca să se măsoare handler-ul, nu rate limit-ul Telegram.
+"""
+import argparse, asyncio, os, time
+from types import SimpleNamespace
+
+for k in ("SEND_GLOBAL_RATE", "SEND_PRIVATE_RATE", "SEND_GROUP_RATE", "SEND_BURST", "SEND_CONCURRENCY"):
+    os.environ.setdefault(k, "100000")
+
+from _common import import_main
+
+def pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] * 1000
+
+class FakeState:
+    def __init__(self, data): self.data = dict(data)
+    async def update_data(self, **kw): self.data.update(kw)
+    async def get_data(self): return dict(self.data)
+    async def clear(self): self.data = {}
+
+async def run(m, n, latency, concurrency):
+    calls = {"n": 0}
+    async def send_message(chat_id, text, **kw):
+        calls["n"] += 1; await asyncio.sleep(latency)
+    async def create_forum_topic(chat_id, name, **kw):
+        calls["n"] += 1; await asyncio.sleep(latency)
+        return SimpleNamespace(message_thread_id=1000 + calls["n"])
+    object.__setattr__(m.bot, "send_message", send_message)
+    object.__setattr__(m.bot, "create_forum_topic", create_forum_topic)
+    m.DEV_GROUP_ID, m.ADMIN_CHAT_ID = -1001234567890, 42
+    m.WRITER.start()
+
+    data = {"category_title": "Bots", "title": "Bot Telegram", "desc": "Descriere", "budget": "300 EUR",
+            "deadline": "10 zile", "deadline_iso": "2030-01-01"}
+    client, e2e = [], []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        uid = 10_000 + i
+        user = SimpleNamespace(id=uid, username=f"u{i}", full_name=f"User {i}")
+        msg = SimpleNamespace(from_user=user, text="@contact",
+                              answer=lambda text, **kw: send_message(uid, text, **kw))
+        async with sem:
+            t0 = time.perf_counter()
+            await m.order_contact(msg, FakeState(data))
+            client.append(time.perf_counter() - t0)
+            pending = list(m.BG_TASKS)
+            if pending: await asyncio.gather(*pending, return_exceptions=True)
+            e2e.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - t0
+    await m.WRITER.close()
+    print(f"{n} comenzi, latență stub {latency * 1000:.0f} ms, concurență {concurrency}, {wall:.2f} s total")
+    for name, xs in (("client", client), ("end-to-end", e2e)):
+        print(f"  {name:<11} p50 {pct(xs, .50):7.1f} ms   p99 {pct(xs, .99):7.1f} ms")
+    print(f"  apeluri Bot API: {calls['n']}, comenzi salvate: {m.STORE.count()}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, default=10)
+    args = ap.parse_args()
+    m = import_main()
+    asyncio.run(run(m, args.n, args.latency, args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark pentru parserele de buget/deadline (parse_amount_currency, norm_amount_str,
+parse_deadline_to_date, normalize_column), comparate cu implementările vechi copiate mai jos.
+
+    python bench/bench_parsers.py [--n 200000] [--distinct 500] [--repeat 5]
+
+Intrările imită ce scriu clienții: sume cu/fără valută („300 lei”, „1 200 EUR”, „10”), termene
+relative („10 zile”, „3 days”) și date în formatele acceptate, plus text fără sens.
+  cold   – toate intrările distincte (cache-ul nu ajută; contează doar regex-urile precompilate)
+  warm   – `--distinct` valori repetate pe `--n` apeluri (cazul real: aceleași texte revin)
+  column – normalize_column pe o coloană de `--n` rânduri (ce face --backfill-orders)
+Înainte de măsurare se verifică faptul că noile parsere dau același rezultat ca cele vechi.
+"""
+import argparse, datetime, random, re, time
+from _common import import_main
+
+# ---- implementările dinaintea precompilării (referință) ----
+def old_parse_deadline_to_date(raw: str):
+    if not raw: return ""
+    raw = raw.strip()
+    m = re.search(r"(\d+)\s*(zi|zile|day|days|дн)", raw.lower())
+    if m:
+        days = int(m.group(1))
+        return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+    fmts = ["%Y-%m-%d","%d.%m.%Y","%d/%m/%Y","%d-%m-%Y","%d %m %Y","%d %b %Y","%d %B %Y"]
+    for f in fmts:
+        try:
+            d = datetime.datetime.strptime(raw, f).date()
+            return d.isoformat()
+        except: pass
+    return ""
+
+def old_parse_amount_currency(raw: str, alias={"LEI":"MDL","MDL":"MDL","EUR":"EUR","USD":"USD","RON":"RON","RUB":"RUB","UAH":"UAH"}):
+    if not raw: return None, None
+    t = raw.upper().replace(" ", "")
+    m = re.search(r"([0-9]+(?:[.,][0-9]+)?)(MDL|LEI|EUR|USD|RON|RUB|UAH)?", t)
+    if not m: return None, None
+    amount = float(m.group(1).replace(",", "."))
+    curr = (m.group(2) or "EUR").upper()
+    return amount, alias.get(curr, "EUR")
+
+def old_norm_amount_str(raw: str):
+    amt, cur = old_parse_amount_currency(raw)
+    return f"{amt:.0f} {cur}" if amt is not None else ""
+
+MONTHS = ["Jan", "February", "mar", "April", "May", "jun", "July", "Aug", "September", "oct", "Nov", "December"]
+
+def gen_budget(rnd, i):
+    n = i if rnd.random() < 0.7 else rnd.randrange(10, 5000)
+    return rnd.choice((f"{n}", f"{n} lei", f"{n} EUR", f"{n}eur", f"{n},50 MDL", f"{n // 1000 or 1} {n % 1000:03d} usd",
+                       f"~{n}$", "Mdl", "negociabil"))
+
+def gen_deadline(rnd, i):
+    d = datetime.date(2020, 1, 1) + datetime.timedelta(days=i % 3000)
+    return rnd.choice((f"{i % 60 + 1} zile", f"{i % 30 + 1} days", f"{i % 9 + 1} zi", d.isoformat(),
+                       d.strftime("%d.%m.%Y"), d.strftime("%d/%m/%Y"), d.strftime("%d-%m-%Y"),
+                       f"{d.day} {MONTHS[d.month - 1]} {d.year}", "cât mai repede", "asap"))
+
+def best(fn, repeat):
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); out.append(time.perf_counter() - t0)
+    return min(out)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--distinct", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args()
+    m = import_main()
+    rnd = random.Random(25)
+    budgets = [gen_budget(rnd, i) for i in range(a.n)]
+    deadlines = [gen_deadline(rnd, i) for i in range(a.n)]
+    hot_b = [budgets[rnd.randrange(a.distinct)] for _ in range(a.n)]
+    hot_d = [deadlines[rnd.randrange(a.distinct)] for _ in range(a.n)]
+
+    bad = [x for x in budgets if m.parse_amount_currency(x) != old_parse_amount_currency(x)]
+    bad += [x for x in deadlines if m.parse_deadline_to_date(x) != old_parse_deadline_to_date(x)]
+    print(f"echivalență: {2 * a.n} intrări, {len(bad)} diferențe" + (f" (ex. {bad[:3]!r})" if bad else ""))
+
+    def cleared(fn):
+        def run():
+            for f in (m._parse_deadline, m.parse_amount_currency, m.norm_amount_str): f.cache_clear()
+            fn()
+        return run
+    cases = [
+        ("budget cold", lambda: [old_norm_amount_str(x) for x in budgets],
+                        cleared(lambda: [m.norm_amount_str(x) for x in budgets])),
+        ("budget warm", lambda: [old_norm_amount_str(x) for x in hot_b],
+                        lambda: [m.norm_amount_str(x) for x in hot_b]),
+        ("budget column", lambda: [old_norm_amount_str(x) for x in hot_b],
+                          cleared(lambda: m.normalize_column(hot_b, m.norm_amount_str))),
+        ("deadline cold", lambda: [old_parse_deadline_to_date(x) for x in deadlines],
+                          cleared(lambda: [m.parse_deadline_to_date(x) for x in deadlines])),
+        ("deadline warm", lambda: [old_parse_deadline_to_date(x) for x in hot_d],
+                          lambda: [m.parse_deadline_to_date(x) for x in hot_d]),
+        ("deadline column", lambda: [old_parse_deadline_to_date(x) for x in hot_d],
+                            cleared(lambda: m.normalize_column(hot_d, m.parse_deadline_to_date))),
+    ]
+    print(f"{'caz':<16} {'vechi':>10} {'nou':>10} {'x':>6}   ({a.n} apeluri, cel mai bun din {a.repeat})")
+    for name, old, new in cases:
+        t_old, t_new = best(old, a.repeat), best(new, a.repeat)
+        print(f"{name:<16} {t_old * 1e3:>8.1f}ms {t_new * 1e3:>8.1f}ms {t_old / t_new:>6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Harness de încărcare offline: update-uri sintetice prin dp.feed_update, fără Telegram.
+
+    python bench/load_harness.py [--users 200] [--claims 2000] [--admin-clicks 500]
+                                 [--latency 0.05] [--jitter 0.5] [--concurrency 50] [--scenario all]
+
+Botul folosește o sesiune stub care răspunde fiecărui apel Bot API cu un obiect plauzibil
+(Message, ForumTopic, True) după `--latency` s (± `--jitter` relativ). Scenarii, rulate pe rând:
+  orders  — fluxul complet de comandă (order: -> titlu -> descriere -> buget -> termen -> contact),
+            câte unul per user, `--concurrency` useri în paralel;
+  claims  — `--claims` claim-uri de la devi diferiți pe cererile create, toate deodată
+            (un dev care apasă de mai multe ori ar fi oprit de throttling);
+  admin   — adminul navighează picker-ele (pagini, detalii, active).
+Raportează update-uri/s per scenariu, latența per handler (p50/p95/p99) și lag-ul buclei
+de evenimente (cât întârzie un sleep de 10 ms). Limitele OUTBOX sunt ridicate: se măsoară
+botul, nu rate limit-ul Telegram.
+"""
+import argparse, asyncio, itertools, os, random, time
+from collections import Counter, defaultdict
+
+ADMIN_ID = 900_000_001
+for k in ("SEND_GLOBAL_RATE", "SEND_PRIVATE_RATE", "SEND_GROUP_RATE", "SEND_BURST", "SEND_CONCURRENCY"):
+    os.environ.setdefault(k, "100000")
+os.environ.setdefault("ADMIN_CHAT_ID", str(ADMIN_ID))
+os.environ.setdefault("DEV_GROUP_ID", "-1001234567890")
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update
+from _common import import_main
+
+def pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] * 1000 if xs else 0.0
+
+class StubSession(BaseSession):
+    """Răspunsuri canonice pentru metodele Bot API, cu latență configurabilă."""
+    def __init__(self, latency: float, jitter: float):
+        super().__init__()
+        self.latency, self.jitter = latency, jitter
+        self.calls = Counter()
+        self.ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        name = type(method).__name__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+        chat_id = getattr(method, "chat_id", None) or 0
+        if name in ("SendMessage", "SendPhoto", "SendVideo", "SendDocument"):
+            return method.__returning__.model_validate({
+                "message_id": next(self.ids), "date": int(time.time()), "text": getattr(method, "text", None) or "",
+                "chat": {"id": chat_id, "type": "private" if isinstance(chat_id, int) and chat_id > 0 else "supergroup"}})
+        if name == "CreateForumTopic":
+            return method.__returning__.model_validate({"message_thread_id": next(self.ids), "name": method.name, "icon_color": 0})
+        if name == "SendMediaGroup":
+            return []
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+class Feeder:
+    def __init__(self, m):
+        self.m = m
+        self.ids = itertools.count(1)
+        self.n = 0
+
+    def _user(self, uid):
+        return {"id": uid, "is_bot": False, "first_name": f"U{uid}", "username": f"u{uid}"}
+
+    async def message(self, uid, text):
+        u = next(self.ids)
+        ents = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith("/") else []
+        await self._feed({"update_id": u, "message": {"message_id": u, "date": int(time.time()), "text": text, "entities": ents,
+                                                      "from": self._user(uid), "chat": {"id": uid, "type": "private"}}})
+
+    async def callback(self, uid, data):
+        u = next(self.ids)
+        await self._feed({"update_id": u, "callback_query": {
+            "id": str(u), "chat_instance": "1", "data": data, "from": self._user(uid),
+            "message": {"message_id": u, "date": int(time.time()), "chat": {"id": uid, "type": "private"}, "text": "…"}}})
+
+    async def _feed(self, raw):
+        self.n += 1
+        await self.m.dp.feed_update(self.m.bot, Update.model_validate(raw))
+
+class Timings:
+    """Middleware interior (după filtre): timpul fiecărui handler, după numele funcției."""
+    def __init__(self):
+        self.by_handler = defaultdict(list)
+
+    async def __call__(self, handler, event, data):
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            h = data.get("handler")
+            self.by_handler[h.callback.__name__ if h else "?"].append(time.perf_counter() - t0)
+
+async def loop_lag(samples, interval=0.01):
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - t0 - interval))
+
+async def drain(m):
+    """Așteaptă fan-out-urile din fundal, coada OUTBOX și writer-ul."""
+    while True:
+        if m.BG_TASKS: await asyncio.gather(*list(m.BG_TASKS), return_exceptions=True)
+        s = m.OUTBOX.stats()
+        if not m.BG_TASKS and not s["depth"] and not s["inflight"]: break
+        await asyncio.sleep(0.01)
+
+async def scenario_orders(m, feed, args):
+    sem = asyncio.Semaphore(args.concurrency)
+    pids = list(m.LANGS["ro"]["cat"])
+    async def one(i):
+        uid = 100_000 + i
+        async with sem:
+            await feed.callback(uid, f"order:{pids[i % len(pids)]}")
+            for text in (f"Comanda {i}", "Descriere pentru încărcare.", "300 EUR", "10 zile", f"@u{uid}"):
+                await feed.message(uid, text)
+    await asyncio.gather(*(one(i) for i in range(args.users)))
+    return args.users   # comenzi
+
+async def scenario_claims(m, feed, args):
+    rnd = random.Random(2)
+    rids = list(dict.keys(m.REQ_INDEX)) or ["NONE"]
+    sem = asyncio.Semaphore(args.concurrency)
+    async def one(i):
+        async with sem: await feed.callback(200_000 + i, f"claim:{rnd.choice(rids)}")
+    await asyncio.gather(*(one(i) for i in range(args.claims)))
+    return args.claims
+
+async def scenario_admin(m, feed, args):
+    rnd = random.Random(1)
+    rids = sorted(dict.keys(m.REQ_INDEX)) or [""]
+    clicks = 0
+    await feed.message(ADMIN_ID, "/admin"); clicks += 1
+    while clicks < args.admin_clicks:   # adminul e unul singur: click-uri secvențiale
+        kind = rnd.random()
+        if kind < 0.5:
+            await feed.callback(ADMIN_ID, f"adm:pg:{rnd.choice(list(m.PICKERS))}:{rnd.choice('np')}:{rnd.choice(rids)}")
+        elif kind < 0.7:
+            await feed.callback(ADMIN_ID, f"adm:details:req:{rnd.choice(rids)}")
+        elif kind < 0.85:
+            await feed.callback(ADMIN_ID, "adm:active")
+        else:
+            await feed.callback(ADMIN_ID, rnd.choice(("adm:assign", "adm:status", "adm:details", "adm:funds")))
+        clicks += 1
+    return clicks
+
+SCENARIOS = {"orders": (scenario_orders, "comenzi"), "claims": (scenario_claims, "claim-uri"), "admin": (scenario_admin, "click-uri")}
+
+async def run(m, args):
+    session = StubSession(args.latency, args.jitter)
+    m.bot.session = session
+    timings = Timings()
+    m.rt.message.middleware(timings); m.rt.callback_query.middleware(timings)
+    m.hydrate_state()
+    m.WRITER.start()
+    lag = []
+    lag_task = asyncio.create_task(loop_lag(lag))
+    feed = Feeder(m)
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    print(f"stub Bot API {args.latency * 1000:.0f} ms ±{args.jitter * 100:.0f}%, concurență {args.concurrency}")
+    for name in names:
+        fn, unit = SCENARIOS[name]
+        n0, lag0 = feed.n, len(lag)
+        h0 = sum(map(len, timings.by_handler.values()))
+        t0 = time.perf_counter()
+        done = await fn(m, feed, args)
+        t_handlers = time.perf_counter() - t0
+        await drain(m)
+        wall = time.perf_counter() - t0
+        ups = feed.n - n0
+        skipped = ups - (sum(map(len, timings.by_handler.values())) - h0)   # throttling / fără handler
+        print(f"{name:<7} {done} {unit}, {ups} update-uri ({skipped} fără handler): {ups / t_handlers:8.0f} update/s"
+              f" ({done / t_handlers:.0f} {unit}/s; cu fan-out + OUTBOX golit: {wall:.2f} s)"
+              f" · lag buclă p99 {pct(lag[lag0:], .99):.1f} ms")
+    lag_task.cancel()
+    await m.WRITER.close()
+    if m.TRACE_PATH: await m.flush_traces()
+    print(f"\n{'handler':<22}{'n':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for h, xs in sorted(timings.by_handler.items(), key=lambda kv: -len(kv[1])):
+        print(f"{h:<22}{len(xs):>7}{pct(xs, .5):9.1f}{pct(xs, .95):9.1f}{pct(xs, .99):9.1f}{max(xs) * 1000:9.1f}")
+    print(f"\nlag buclă: p50 {pct(lag, .5):.2f} ms · p99 {pct(lag, .99):.2f} ms · max {max(lag, default=0) * 1000:.2f} ms")
+    print("apeluri Bot API:", dict(session.calls.most_common()))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--claims", type=int, default=2000)
+    ap.add_argument("--admin-clicks", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.5)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    args = ap.parse_args()
+    m = import_main()
+    asyncio.run(run(m, args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Trimite update-uri înregistrate (JSON) la endpoint-ul de webhook, ca Telegram.
+
+    RUN_MODE=webhook WEBHOOK_SECRET=s3cret python main.py        # în alt terminal
+    python bench/post_updates.py bench/updates_sample.jsonl --secret s3cret [--repeat 20] [--concurrency 10]
+
+Fișierul e JSONL (un update pe linie) sau un director cu *.json. Cu --repeat, update_id-urile
+sunt renumerotate ca să nu fie tratate drept duplicate. Raportează codurile HTTP și latența
+răspunsului (botul trebuie să răspundă imediat; procesarea e în fundal).
+"""
+import argparse, asyncio, json, pathlib, time
+from collections import Counter
+import aiohttp
+
+def load_updates(src: pathlib.Path):
+    if src.is_dir():
+        return [json.loads(p.read_text(encoding="utf-8")) for p in sorted(src.glob("*.json"))]
+    return [json.loads(line) for line in src.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+async def run(args):
+    base = load_updates(pathlib.Path(args.src))
+    updates = []
+    for i in range(args.repeat):
+        for u in base:
+            updates.append({**u, "update_id": len(updates) + 1})
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    codes, lat = Counter(), []
+    sem = asyncio.Semaphore(args.concurrency)
+    async with aiohttp.ClientSession(headers=headers) as http:
+        async def post(u):
+            async with sem:
+                t0 = time.perf_counter()
+                async with http.post(args.url, json=u) as resp:
+                    await resp.read()
+                    codes[resp.status] += 1
+                lat.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(post(u) for u in updates))
+        wall = time.perf_counter() - t0
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    print(f"{len(updates)} update-uri în {wall:.2f} s ({len(updates) / wall:.0f}/s) · coduri {dict(codes)}")
+    print(f"latență răspuns p50 {pct(.5):.1f} ms · p99 {pct(.99):.1f} ms · max {lat[-1] * 1000:.1f} ms")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("src", help="fișier .jsonl sau director cu *.json")
+    ap.add_argument("--url", default="http://127.0.0.1:8080/tg/webhook")
+    ap.add_argument("--secret", default="")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Mai multe procese scriu în aceleași orders_log.csv / earnings_log.csv.
+
+    python bench/stress_multiproc.py [--procs 4] [--updates 400] [--rows 60] [--shared 3]
+                                     [--compact-min 50] [--sync] [--no-lock]
+
+Fiecare proces importă botul în același director și face `--updates` update_order pe
+cererile lui (rândurile i % procs == w), plus log_order (cereri noi) și append_earning
+la intervale fixe; ORDERS_COMPACT_MIN mic forțează compactări concurente. Pe lângă
+asta, toate procesele adaugă note (append_order_note, ca /comment și progresul dev) pe
+aceleași `--shared` cereri. La final, o încărcare proaspătă trebuie să conțină ultima
+valoare scrisă de fiecare proces pe fiecare cerere, toate cererile noi, toate notele de
+pe cererile comune și toate rândurile de earnings. Cu --no-lock, file_lock devine no-op
+(comportamentul de dinainte), ca termen de comparație.
+"""
+import argparse, asyncio, csv, multiprocessing, os, tempfile, time
+from _common import import_main
+
+def worker(workdir, w, args):
+    os.environ["ORDERS_COMPACT_MIN"] = str(args.compact_min)
+    m = import_main(workdir)
+    if args.no_lock: m.fcntl = None
+    mine = [f"R{i:04d}" for i in range(args.rows) if i % args.procs == w]
+
+    def step(k):
+        ack = m.update_order(mine[k % len(mine)], notes=f"w{w}:{k}", started_ts=m.now_iso())
+        if k % 4 == 0:   # aceleași rânduri în toate procesele: read-modify-write pe notes
+            m.append_order_note(f"S{k % args.shared:02d}", f"w{w}:n{k}")
+        if k % 10 == 0:
+            m.log_order({"ts": m.now_iso(), "req_id": f"W{w}-{k}", "user_id": str(w), "status": "nou"})
+        if k % 5 == 0:
+            m.append_earning(f"W{w}", w, f"dev{w}", 1.0, "EUR", f"k{k}")
+        m.get_order(f"R{(w + k) % args.rows:04d}")   # citește și rânduri străine => refresh
+        return ack
+
+    if args.sync:
+        for k in range(args.updates): step(k)
+        return
+
+    async def run():
+        m.WRITER.start()
+        acks = []
+        for k in range(args.updates):
+            acks.append(step(k))
+            if k % 20 == 19:
+                await asyncio.gather(*(a for a in acks if asyncio.isfuture(a))); acks = []
+            await asyncio.sleep(0)
+        await m.WRITER.close()
+    asyncio.run(run())
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=4)
+    ap.add_argument("--updates", type=int, default=400)
+    ap.add_argument("--rows", type=int, default=60)
+    ap.add_argument("--shared", type=int, default=3, help="cereri pe care notează toate procesele")
+    ap.add_argument("--compact-min", type=int, default=50)
+    ap.add_argument("--sync", action="store_true", help="fără OrderWriter: scriere sincronă la fiecare apel")
+    ap.add_argument("--no-lock", action="store_true")
+    args = ap.parse_args()
+    workdir = tempfile.mkdtemp(prefix="stress-")
+    m = import_main(workdir)
+    m.save_log([{"ts": m.now_iso(), "req_id": f"R{i:04d}", "status": "nou"} for i in range(args.rows)]
+               + [{"ts": m.now_iso(), "req_id": f"S{i:02d}", "status": "nou"} for i in range(args.shared)])
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=worker, args=(workdir, w, args)) for w in range(args.procs)]
+    t0 = time.perf_counter()
+    for p in procs: p.start()
+    for p in procs: p.join()
+    wall = time.perf_counter() - t0
+    crashed = sum(p.exitcode != 0 for p in procs)
+
+    store = m.CsvBackend(m.LOG_PATH, m.JOURNAL_PATH, m.EARN_PATH)
+    lost = 0
+    for w in range(args.procs):
+        mine = [f"R{i:04d}" for i in range(args.rows) if i % args.procs == w]
+        last = {}
+        for k in range(args.updates): last[mine[k % len(mine)]] = f"w{w}:{k}"
+        lost += sum((store.get(rid) or {}).get("notes") != v for rid, v in last.items())
+        lost += sum(store.get(f"W{w}-{k}") is None for k in range(0, args.updates, 10))
+    notes = {f"S{i:02d}": set(((store.get(f"S{i:02d}") or {}).get("notes") or "").splitlines()) for i in range(args.shared)}
+    lost_notes = sum(f"w{w}:n{k}" not in notes[f"S{k % args.shared:02d}"]
+                     for w in range(args.procs) for k in range(0, args.updates, 4))
+    expected_earn = args.procs * len(range(0, args.updates, 5))
+    with m.EARN_PATH.open(newline="", encoding="utf-8") as f:
+        earn = list(csv.DictReader(f))
+    bad_earn = sum(set(r) != set(m.EARN_FIELDS) or None in r.values() for r in earn)
+    print(f"{args.procs} procese × {args.updates} update-uri ({'sync' if args.sync else 'OrderWriter'},"
+          f" lock {'off' if args.no_lock else 'on'}) în {wall:.1f} s; procese căzute: {crashed}")
+    print(f"  cereri: {store.count()} · update-uri pierdute: {lost} · note pierdute pe cereri comune: {lost_notes}"
+          f" · earnings {len(earn)}/{expected_earn},"
+          f" rânduri corupte {bad_earn} · jurnal {store.journal_len} linii")
+    raise SystemExit(1 if lost or lost_notes or crashed or bad_earn or len(earn) != expected_earn else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,22 @@
 # -*- coding: utf-8 -*-
-import os, asyncio, glob, html, re, uuid, csv, pathlib, datetime, time, hashlib
+import os, sys, asyncio, html, re, uuid, csv, pathlib, datetime, time, hashlib, json, sqlite3, threading, bisect
+import shutil, traceback, subprocess, concurrent.futures, collections, heapq, itertools, struct, array, contextlib, functools, contextvars
 from collections import defaultdict
+from types import MappingProxyType
 from dotenv import load_dotenv
+from aiohttp import web
 from aiogram import Bot, Dispatcher, Router, F
 from aiogram.filters import Command
 from aiogram.types import (
     Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton,
     InputMediaPhoto, InputMediaVideo, InputMediaAnimation, InputMediaDocument,
-    FSInputFile
+    FSInputFile, BufferedInputFile, ErrorEvent, Update
 )
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 # ==================== Utils ====================
 def esc(x): return html.escape(str(x or ""))
@@ -35,23 +39,40 @@ def chat_id_to_cid(chat_id: int) -> str:
 def sha1_hex(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()[:10]
 
-def parse_deadline_to_date(raw: str):
-    """Normalizează deadline în ISO (YYYY-MM-DD). Acceptă date și '10 zile'."""
-    if not raw: return ""
-    raw = raw.strip()
-    # zile relative
-    m = re.search(r"(\d+)\s*(zi|zile|day|days|дн)", raw.lower())
+# Parsere pentru buget/termen: un singur regex precompilat per câmp, rezultate memoizate
+# (aceleași texte revin la fiecare schimbare de status / payout). Termenele relative
+# („10 zile”) depind de ziua de bază, care face parte din cheia cache-ului.
+PARSE_CACHE = int(os.getenv("PARSE_CACHE", "4096"))
+_REL_DAYS = re.compile(r"(\d+)\s*(zi|zile|day|days|дн)", re.I)
+# echivalentul formatelor strptime acceptate înainte, în aceeași ordine:
+# %Y-%m-%d, %d.%m.%Y, %d/%m/%Y, %d-%m-%Y, %d %m %Y, %d %b %Y, %d %B %Y
+_D, _M = r"3[01]|[12]\d|0[1-9]|[1-9]| [1-9]", r"1[0-2]|0[1-9]|[1-9]"
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december")
+_MONTH_NO = {n: i for i, m in enumerate(_MONTHS, 1) for n in (m, m[:3])}
+_DATE = re.compile("|".join((
+    rf"(?P<y0>\d{{4}})-(?P<m0>{_M})-(?P<d0>{_D})",
+    *(rf"(?P<d{i}>{_D}){sep}(?P<m{i}>{_M}){sep}(?P<y{i}>\d{{4}})" for i, sep in ((1, r"\."), (2, "/"), (3, "-"), (4, r"\s+"))),
+    rf"(?P<d5>{_D})\s+(?P<b5>{'|'.join(sorted(_MONTH_NO, key=len, reverse=True))})\s+(?P<y5>\d{{4}})",
+)), re.I)
+
+@functools.lru_cache(maxsize=PARSE_CACHE)
+def _parse_deadline(raw: str, base: datetime.date) -> str:
+    m = _REL_DAYS.search(raw)
     if m:
-        days = int(m.group(1))
-        return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
-    # formate date
-    fmts = ["%Y-%m-%d","%d.%m.%Y","%d/%m/%Y","%d-%m-%Y","%d %m %Y","%d %b %Y","%d %B %Y"]
-    for f in fmts:
-        try:
-            d = datetime.datetime.strptime(raw, f).date()
-            return d.isoformat()
-        except: pass
-    return ""
+        try: return (base + datetime.timedelta(days=int(m.group(1)))).isoformat()
+        except (OverflowError, ValueError): return ""   # „99999999 zile”
+    m = _DATE.fullmatch(raw)
+    if not m: return ""
+    i = next(k[1] for k, v in m.groupdict().items() if v is not None and k[0] == "y")
+    month = m[f"m{i}"] if i != "5" else _MONTH_NO[m["b5"].lower()]
+    try: return datetime.date(int(m[f"y{i}"]), int(month), int(m[f"d{i}"])).isoformat()
+    except ValueError: return ""   # ex. 2025-02-30
+
+def parse_deadline_to_date(raw: str, base: datetime.date | None = None):
+    """Normalizează deadline în ISO (YYYY-MM-DD). Acceptă date și '10 zile' (relativ la `base`, implicit azi)."""
+    if not raw: return ""
+    return _parse_deadline(raw.strip(), base or datetime.date.today())
 
 def human_delta(from_ts_iso: str):
     if not from_ts_iso: return "n/a"
@@ -83,20 +104,27 @@ def time_left(deadline_iso: str):
 
 CURRENCY_ALIAS = {"LEI":"MDL","MDL":"MDL","EUR":"EUR","USD":"USD","RON":"RON","RUB":"RUB","UAH":"UAH"}
 
+_AMOUNT = re.compile(r"([0-9]+(?:[.,][0-9]+)?)(MDL|LEI|EUR|USD|RON|RUB|UAH)?", re.I)
+_PLAIN_AMOUNT = re.compile(r"\s*[0-9]+(?:[.,][0-9]+)?\s*(?:MDL|LEI|EUR|USD|RON|RUB|UAH)?\s*", re.I)   # „300 lei”, „10”
+
+@functools.lru_cache(maxsize=PARSE_CACHE)
 def parse_amount_currency(raw: str):
     if not raw: return None, None
-    t = raw.upper().replace(" ", "")
-    m = re.search(r"([0-9]+(?:[.,][0-9]+)?)(MDL|LEI|EUR|USD|RON|RUB|UAH)?", t)
+    m = _AMOUNT.search(raw.replace(" ", ""))
     if not m: return None, None
     amount = float(m.group(1).replace(",", "."))
-    curr = (m.group(2) or "EUR").upper()
-    curr = CURRENCY_ALIAS.get(curr, "EUR")
-    return amount, curr
+    return amount, CURRENCY_ALIAS.get((m.group(2) or "EUR").upper(), "EUR")
 
+@functools.lru_cache(maxsize=PARSE_CACHE)
 def norm_amount_str(raw: str):
     amt, cur = parse_amount_currency(raw)
     return f"{amt:.0f} {cur}" if amt is not None else ""
 
+def normalize_column(values, parse):
+    """parse() pe o coloană întreagă; fiecare valoare distinctă e parsată o singură dată."""
+    seen = {}
+    return [seen[v] if v in seen else seen.setdefault(v, parse(v)) for v in values]
+
 def calc_group_budget_text(raw_budget: str) -> str:
     amt, curr = parse_amount_currency(raw_budget)
     if amt is None: return raw_budget or "n/a"
@@ -106,6 +134,7 @@ def calc_group_budget_text(raw_budget: str) -> str:
 now_iso = lambda: datetime.datetime.now().isoformat(timespec="seconds")
 
 # ==================== ENV & Boot ====================
+BOOT_T0 = time.perf_counter()
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_CHAT_ID = int(os.getenv("ADMIN_CHAT_ID", "0") or 0)
@@ -114,6 +143,16 @@ ADMIN_COMMISSION_PCT = float(os.getenv("ADMIN_COMMISSION_PCT", "10"))
 HASH_SALT = os.getenv("HASH_SALT", "salt")
 MANAGER_IDS = {int(x) for x in (os.getenv("MANAGER_IDS","").replace(" ","").split(",") if os.getenv("MANAGER_IDS") else [])}
 
+# RUN_MODE=polling (implicit) | webhook. În webhook, WEBHOOK_URL e baza publică (https://...);
+# dacă lipsește, webhook-ul se setează extern și botul doar ascultă pe WEBHOOK_HOST:WEBHOOK_PORT.
+RUN_MODE = os.getenv("RUN_MODE", "polling").lower()
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+ALLOWED_UPDATES = ["message", "callback_query"]
+
 if not BOT_TOKEN:
     raise SystemExit("BOT_TOKEN lipsă în .env")
 
@@ -152,6 +191,7 @@ LANGS = {
         "client_thanks": "Mulțumim! Cererea ta a fost înregistrată ca",
         "ideas_header": "Selectează o idee:",
         "examples_header": "Exemple:",
+        "btn_more_media": "▶️ Următorul album",
         "cat": {
             # categorii noi
             "prog_auto": {
@@ -326,6 +366,7 @@ LANGS = {
         "client_thanks": "Спасибо! Ваша заявка зарегистрирована как",
         "ideas_header": "Выберите идею:",
         "examples_header": "Примеры:",
+        "btn_more_media": "▶️ Следующий альбом",
         "cat": {
             "prog_auto": {
                 "title": "💻 Программирование и автоматизация",
@@ -371,6 +412,7 @@ LANGS = {
         "client_thanks": "Thanks! Your request has been registered as",
         "ideas_header": "Pick an idea:",
         "examples_header": "Examples:",
+        "btn_more_media": "▶️ Next album",
         "cat": {
             "prog_auto": {
                 "title": "💻 Programming & Automation",
@@ -396,12 +438,292 @@ LANGS = {
     }
 }
 
-USER_LANG = {}
+# ===== Stare în memorie, mărginită =====
+class BoundedCache:
+    """dict mărginit: LRU la `maxsize` intrări + expirare după `ttl` secunde.
+
+    Cheile stau în ordinea ultimei scrieri (sau citiri, cu `refresh_on_read`), deci cele
+    expirate sunt mereu la început: curățarea la fiecare scriere e O(1) amortizat.
+    `default_factory` (ca la defaultdict) completează cheile lipsă; `loader(key)` reîncarcă
+    doar cheile evacuate LRU sau cu `spill` (nu și pe cele expirate sau scoase cu pop). Lista cheilor evacuate
+    e și ea mărginită la `maxsize`: după ce a pierdut chei, loader-ul e întrebat la orice lipsă.
+    """
+    def __init__(self, name: str, maxsize: int, ttl: float | None = None, refresh_on_read: bool = True,
+                 default_factory=None, loader=None):
+        self.name = name; self.maxsize = maxsize; self.ttl = ttl
+        self.refresh_on_read = refresh_on_read
+        self.default_factory = default_factory; self.loader = loader
+        self.data = collections.OrderedDict()   # {key: [value, expires_at]}
+        self.spilled = collections.OrderedDict()   # chei evacuate LRU, reîncărcabile prin loader
+        self.spill_lost = False                    # au ieșit chei și din `spilled`
+        self.evicted = 0; self.expired = 0
+        BOUNDED_CACHES.append(self)
+
+    def _prune(self, now: float):
+        d = self.data
+        while d:
+            key, (_v, exp) = next(iter(d.items()))
+            if exp is None or exp > now: break
+            d.popitem(last=False); self.expired += 1
+        while len(d) > self.maxsize:
+            key, _ent = d.popitem(last=False); self.evicted += 1
+            self._mark_spilled(key)
+
+    def _mark_spilled(self, key):
+        if self.loader is None: return
+        self.spilled[key] = None; self.spilled.move_to_end(key)
+        if len(self.spilled) > self.maxsize:
+            self.spilled.popitem(last=False); self.spill_lost = True
+
+    def _spilled(self, key) -> bool:
+        return self.loader is not None and (key in self.spilled or self.spill_lost)
+
+    def _lookup(self, key):
+        ent = self.data.get(key)
+        if ent is None: return None
+        now = time.monotonic()
+        if ent[1] is not None and ent[1] <= now:
+            del self.data[key]; self.expired += 1
+            return None
+        if self.refresh_on_read:
+            self.data.move_to_end(key)
+            if self.ttl: ent[1] = now + self.ttl
+        return ent
+
+    def _load(self, key):
+        # cât loader-ul întoarce None (ex. cerere închisă), cheia rămâne reîncărcabilă
+        if not self._spilled(key): return None
+        val = self.loader(key)
+        if val is not None: self.spilled.pop(key, None); self[key] = val
+        return val
+
+    def _fill(self, key):
+        val = self._load(key)
+        if val is not None: return val
+        if self.default_factory is not None:
+            self.spilled.pop(key, None)
+            val = self[key] = self.default_factory()
+            return val
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        now = time.monotonic()
+        self.data[key] = [value, now + self.ttl if self.ttl else None]
+        self.data.move_to_end(key)
+        self._prune(now)
+
+    def __getitem__(self, key):
+        ent = self._lookup(key)
+        return ent[0] if ent is not None else self._fill(key)
+
+    def get(self, key, default=None):
+        ent = self._lookup(key)
+        if ent is not None: return ent[0]
+        val = self._load(key)
+        return default if val is None else val
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def pop(self, key, default=None):
+        self.spilled.pop(key, None)
+        ent = self.data.pop(key, None)
+        return default if ent is None else ent[0]
+
+    def spill(self, key):
+        """Scoate valoarea din memorie, dar cheia rămâne reîncărcabilă prin loader (spre deosebire de pop)."""
+        if self.data.pop(key, None) is not None: self._mark_spilled(key)
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self) -> dict:
+        self._prune(time.monotonic())
+        size = sys.getsizeof(self.data) + sum(sys.getsizeof(k) + _deep_size(v[0]) for k, v in self.data.items())
+        return {"len": len(self.data), "maxsize": self.maxsize, "ttl": self.ttl, "spilled": len(self.spilled),
+                "evicted": self.evicted, "expired": self.expired, "bytes": size}
+
+def _deep_size(obj, depth: int = 3) -> int:
+    """Estimare (sys.getsizeof recursiv pe dict/list/set, până la `depth`)."""
+    size = sys.getsizeof(obj)
+    if depth <= 0: return size
+    if isinstance(obj, dict):
+        return size + sum(sys.getsizeof(k) + _deep_size(v, depth - 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(_deep_size(v, depth - 1) for v in obj)
+    return size
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) * 1024
+    except OSError: pass
+    import resource   # fallback (macOS/BSD): vârful, nu valoarea curentă
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+BOUNDED_CACHES = []
+STATE_MAX_USERS = int(os.getenv("STATE_MAX_USERS", "100000"))
+
+# ===== Lock-uri între procese =====
+# Mai multe procese ale botului pot lucra în același director: fiecare read-modify-write
+# și append pe fișierele de date se face sub flock pe `<fișier>.lock`. Lock-ul stă pe un
+# fișier separat, deci rămâne valid și când fișierul de date e înlocuit prin rename.
+try:
+    import fcntl
+except ImportError:   # fără fcntl (Windows): un singur proces, lock-urile devin no-op
+    fcntl = None
+
+@contextlib.contextmanager
+def file_lock(path: pathlib.Path, shared: bool = False, blocking: bool = True):
+    """Yield True cu lock-ul luat; False doar cu blocking=False, dacă e ținut de altcineva."""
+    if fcntl is None:
+        yield True; return
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try: fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False; return
+        try: yield True
+        finally: fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+def file_sig(path: pathlib.Path):
+    """(inode, mărime) sau None — un singur stat, folosit ca să detectăm scrieri din alte procese."""
+    try: st = os.stat(path)
+    except FileNotFoundError: return None
+    return st.st_ino, st.st_size
+
+# ===== Limba utilizatorilor (persistentă) =====
+LANG_PATH = pathlib.Path(os.getenv("LANG_PATH", "user_lang.bin"))
+LANG_COMPACT_MIN = int(os.getenv("LANG_COMPACT_MIN", "10000"))
+LANG_FOLD_MAX = int(os.getenv("LANG_FOLD_MAX", "4096"))   # câte scrieri noi stau în dict înainte de merge
+LANG_REC = struct.Struct("<q2s")   # user_id (int64) + cod limbă ASCII, 10 octeți/înregistrare
+
+class LangStore:
+    """Jurnal binar append-only (LANG_REC) + index compact în memorie.
+
+    La încărcare, ultima înregistrare a fiecărui user câștigă; rezultatul devine două
+    tablouri paralele sortate (array('q') cu user_id-uri + bytearray cu indexul limbii),
+    căutate cu bisect — fără I/O pe disc la citire. Scrierile noi merg într-un dict mic
+    (`recent`, mutat în tablouri la LANG_FOLD_MAX intrări) și se adaugă la fișier; când jurnalul
+    are de 2x mai multe înregistrări decât useri, se compactează (rescriere atomică, într-un
+    thread dacă rulează bucla de evenimente).
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.table = tuple(LANGS)                   # index -> cod (doar în memorie)
+        self.idx = {c: i for i, c in enumerate(self.table)}
+        self.raw_idx = defaultdict(lambda: 255, {c.encode("ascii"): i for i, c in enumerate(self.table)})   # 255 = limbă necunoscută
+        self.uids = array.array("q"); self.codes = bytearray()
+        self.recent = {}                            # {user_id: cod} scrise după ultima compactare
+        self.records = 0
+        self.loaded = False
+        self.compacting = False
+
+    def _ensure(self):
+        if not self.loaded: self.load()
+
+    def _read(self):
+        data = self.path.read_bytes() if self.path.exists() else b""
+        data = data[:len(data) - len(data) % LANG_REC.size]   # coadă trunchiată (crash la scriere)
+        self.records = len(data) // LANG_REC.size
+        return dict(LANG_REC.iter_unpack(data))
+
+    def load(self):
+        t0 = time.perf_counter()
+        with file_lock(self.path, shared=True):
+            last = self._read()
+        keys = sorted(last)   # după compactare fișierul e deja sortat => timsort ~O(n)
+        self.uids = array.array("q", keys)
+        self.codes = bytearray(map(self.raw_idx.__getitem__, map(last.__getitem__, keys)))
+        self.recent = {}
+        self.loaded = True
+        print(f"[I] limbi: {len(keys)} useri din {self.records} înregistrări, {1000 * (time.perf_counter() - t0):.0f} ms")
+
+    def lookup(self, user_id: int):
+        self._ensure()
+        code = self.recent.get(user_id)
+        if code is not None: return code
+        i = bisect.bisect_left(self.uids, user_id)
+        if i < len(self.uids) and self.uids[i] == user_id and self.codes[i] < len(self.table):
+            return self.table[self.codes[i]]
+        return None
+
+    def put(self, user_id: int, code: str):
+        if self.lookup(user_id) == code: return   # fără înregistrări redundante
+        with file_lock(self.path), self.path.open("ab") as f:
+            f.write(LANG_REC.pack(user_id, code.encode("ascii")))
+        self.recent[user_id] = code; self.records += 1
+        if self.compacting: return
+        if len(self.recent) >= LANG_FOLD_MAX: self._fold()
+        if self.records > max(LANG_COMPACT_MIN, 2 * (len(self.uids) + len(self.recent))):
+            try: asyncio.get_running_loop()
+            except RuntimeError: return self.compact()   # scripturi: sincron
+            self.compacting = True
+            background(self._compact_async())
+
+    def _fold(self):
+        """Mută `recent` în tablourile sortate: update pe loc + merge pentru useri noi, fără I/O."""
+        new = []
+        for uid, code in self.recent.items():
+            i = bisect.bisect_left(self.uids, uid)
+            if i < len(self.uids) and self.uids[i] == uid: self.codes[i] = self.idx[code]
+            else: new.append((uid, self.idx[code]))
+        if new:
+            new.sort()
+            uids = array.array("q"); codes = bytearray(); prev = 0
+            for uid, c in new:
+                i = bisect.bisect_left(self.uids, uid, prev)
+                uids.extend(self.uids[prev:i]); codes += self.codes[prev:i]
+                uids.append(uid); codes.append(c); prev = i
+            uids.extend(self.uids[prev:]); codes += self.codes[prev:]
+            self.uids, self.codes = uids, codes
+        self.recent = {}
+
+    def compact(self):
+        self.uids, self.codes, self.records = self._rewrite()
+        self.recent = {}
+
+    async def _compact_async(self):
+        start = self.records
+        try:
+            uids, codes, n = await asyncio.to_thread(self._rewrite)
+            # `recent` rămâne: are și ce s-a scris cât a rulat thread-ul (e verificat primul la lookup)
+            self.uids, self.codes, self.records = uids, codes, n + self.records - start
+        except OSError as e:
+            print("[W] limbi: compactare:", repr(e))
+        finally:
+            self.compacting = False
+
+    def _rewrite(self):
+        """Rescrie jurnalul sortat; întoarce (uids, codes, înregistrări). Pornește de la fișier
+        (sub lock), nu din memorie, ca să păstreze și înregistrările altor procese."""
+        with file_lock(self.path):
+            last = self._read()
+            last = {uid: code for uid, code in last.items() if code in self.raw_idx}   # fără coduri necunoscute
+            keys = sorted(last)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with tmp.open("wb") as f:
+                f.write(b"".join(LANG_REC.pack(uid, last[uid]) for uid in keys))
+                f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        return (array.array("q", keys), bytearray(map(self.raw_idx.__getitem__, map(last.__getitem__, keys))),
+                len(keys))
+
+LANG_STORE = LangStore(LANG_PATH)
+USER_LANG = BoundedCache("USER_LANG", STATE_MAX_USERS, ttl=float(os.getenv("USER_LANG_TTL", str(30 * 86400))))   # LRU în fața LANG_STORE
+
 def get_lang(user_id) -> str:
-    code = USER_LANG.get(user_id, "ro")
+    code = USER_LANG.get(user_id)
+    if code is None:
+        code = USER_LANG[user_id] = LANG_STORE.lookup(user_id) or "ro"
     return code if code in LANGS else "ro"
 def set_lang(user_id, code: str):
-    USER_LANG[user_id] = code if code in LANGS else "ro"
+    code = code if code in LANGS else "ro"
+    USER_LANG[user_id] = code
+    LANG_STORE.put(user_id, code)
 
 def language_kb():
     kb = InlineKeyboardBuilder()
@@ -483,74 +805,1247 @@ IDEAS = {
     }
 }
 
+# ==================== Metrici (Prometheus) ====================
+# Histograme/contoare în memorie: observe() e un bisect + două incrementări, iar textul
+# Prometheus se generează doar la scrape (GET /metrics pe METRICS_HOST:METRICS_PORT).
+METRIC_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+METRICS = []        # histograme și contoare, în ordinea din /metrics
+METRIC_GAUGES = []  # callable() -> [(nume, help, valoare)], evaluate la scrape
+
+def _prom_labels(names, values, extra: str = "") -> str:
+    esc_ = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+    parts = [f'{k}="{esc_(v)}"' for k, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=METRIC_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self.series = {}   # {valori etichete: [n per bucket (necumulativ)..., n peste ultimul, sumă]}
+        self.lock = threading.Lock()   # write_batch/compact observă din thread-uri
+        METRICS.append(self)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            s = self.series.get(labels)
+            if s is None: s = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1; s[-1] += value
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock: series = [(k, list(v)) for k, v in self.series.items()]
+        les = [f'le="{b}"' for b in self.buckets] + ['le="+Inf"']
+        for labels, s in sorted(series):
+            acc = 0
+            for le, c in zip(les, s):
+                acc += c
+                out.append(f"{self.name}_bucket{_prom_labels(self.labels, labels, le)} {acc}")
+            out.append(f"{self.name}_sum{_prom_labels(self.labels, labels)} {s[-1]:.6f}")
+            out.append(f"{self.name}_count{_prom_labels(self.labels, labels)} {acc}")
+        return out
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+        METRICS.append(self)
+
+    def inc(self, *labels, n: float = 1):
+        with self.lock: self.series[labels] = self.series.get(labels, 0) + n
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock: series = sorted(self.series.items())
+        out += [f"{self.name}{_prom_labels(self.labels, labels)} {v}" for labels, v in series]
+        return out
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Durata handler-elor aiogram.", ("handler", "prefix"))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Excepții ieșite din handler-e.", ("handler", "error"))
+API_SECONDS = Histogram("bot_api_seconds", "Durata apelurilor Bot API.", ("method",))
+API_ERRORS = Counter("bot_api_errors_total", "Apeluri Bot API eșuate.", ("method", "error"))
+IO_SECONDS = Histogram("bot_io_seconds", "Durata operațiilor pe fișierele CRM.", ("op",))
+
+def timed_io(op: str):
+    """Decorator: durata apelului ajunge în IO_SECONDS{op} (și ca span, dacă rulează într-un trace)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                with span(op): return fn(*args, **kwargs)
+            finally:
+                IO_SECONDS.observe(time.perf_counter() - t0, op)
+        return wrapper
+    return deco
+
+def render_metrics() -> str:
+    out = []
+    for m in METRICS: out += m.render()
+    seen = set()
+    for g in METRIC_GAUGES:
+        for name, help, value in g():
+            base = name.split("{", 1)[0]
+            if base not in seen:   # HELP/TYPE o singură dată per metrică, și când are etichete
+                seen.add(base); out += [f"# HELP {base} {help}", f"# TYPE {base} gauge"]
+            out.append(f"{name} {value}")
+    return "\n".join(out) + "\n"
+
+# ==================== Trace-uri per update ====================
+# Fiecare update are un trace: span-ul rădăcină (middleware pe dp.update) și span-uri copil
+# pentru I/O pe fișiere (timed_io), apelurile Bot API (middleware pe sesiune), scrierile
+# OrderWriter și job-urile din fundal. Părintele curent circulă prin contextvars; OUTBOX și
+# OrderWriter îl duc cu ele în coadă. Un trace se închide când handler-ul, fan-out-ul și
+# trimiterile lui s-au terminat; ajunge în TRACES (ring buffer, /traces) și, cu TRACE_PATH, în JSONL.
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "1") != "0"
+TRACE_PATH = os.getenv("TRACE_PATH", "")    # ex. traces.jsonl; gol = doar în memorie
+TRACE_RING = int(os.getenv("TRACE_RING", "500"))
+TRACE_FLUSH_S = float(os.getenv("TRACE_FLUSH_S", "1"))   # cât se adună liniile înainte de scriere
+TRACE_PENDING = []    # linii JSONL încă nescrise în TRACE_PATH
+_trace_flush = None   # task-ul de flush programat
+TRACES = collections.deque(maxlen=TRACE_RING)
+CURRENT_SPAN = contextvars.ContextVar("CURRENT_SPAN", default=None)
+
+class Span:
+    __slots__ = ("trace", "name", "attrs", "t0", "ms", "error", "children")
+
+    def __init__(self, trace, name: str, attrs=None, t0: float | None = None):
+        self.trace, self.name, self.attrs = trace, name, attrs or {}
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.ms = None; self.error = ""; self.children = []
+
+    def to_dict(self, origin: float):
+        d = {"name": self.name, "at_ms": round((self.t0 - origin) * 1000, 3),
+             "ms": None if self.ms is None else round(self.ms, 3)}
+        if self.attrs: d["attrs"] = self.attrs
+        if self.error: d["error"] = self.error
+        if self.children: d["spans"] = [c.to_dict(origin) for c in self.children]
+        return d
+
+class Trace:
+    """Span rădăcină + numărul de lucrări încă deschise (handler, job-uri din fundal, trimiteri)."""
+    def __init__(self, name: str, attrs=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.ts = time.time()
+        self.root = Span(self, name, attrs)
+        self.open = 1
+
+    def hold(self):
+        self.open += 1
+
+    def release(self):
+        self.open -= 1
+        if self.open == 0: export_trace(self)
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Span copil al span-ului curent; no-op în afara unui trace."""
+    parent = CURRENT_SPAN.get()
+    if parent is None:
+        yield None; return
+    s = Span(parent.trace, name, attrs)
+    parent.children.append(s)
+    token = CURRENT_SPAN.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__; raise
+    finally:
+        s.ms = (time.perf_counter() - s.t0) * 1000
+        CURRENT_SPAN.reset(token)
+
+def record_span(parent, name: str, t0: float, t1: float, **attrs):
+    """Span deja terminat (ex. scriere comasată în OrderWriter, măsurată în afara contextului)."""
+    s = Span(parent.trace, name, attrs, t0)
+    s.ms = (t1 - t0) * 1000
+    parent.children.append(s)
+
+def trace_note(**attrs):
+    s = CURRENT_SPAN.get()
+    if s is not None: s.trace.root.attrs.update(attrs)
+
+def export_trace(tr: Trace):
+    root = tr.root
+    d = {"trace_id": tr.id, "ts": datetime.datetime.fromtimestamp(tr.ts).isoformat(timespec="milliseconds"),
+         "total_ms": round((time.perf_counter() - root.t0) * 1000, 3), **root.to_dict(root.t0)}
+    TRACES.append(d)
+    if TRACE_PATH:
+        TRACE_PENDING.append(json.dumps(d, ensure_ascii=False) + "\n")
+        _schedule_trace_flush()
+
+def _append_traces(lines):
+    try:
+        with open(TRACE_PATH, "a", encoding="utf-8") as f: f.writelines(lines)
+    except OSError as e:
+        print("[W] trace:", repr(e))
+
+def _take_pending():
+    lines = TRACE_PENDING[:]; TRACE_PENDING.clear()
+    return lines
+
+def _schedule_trace_flush():
+    global _trace_flush
+    if _trace_flush is not None and not _trace_flush.done(): return
+    try:
+        _trace_flush = asyncio.get_running_loop().create_task(flush_traces(TRACE_FLUSH_S))
+    except RuntimeError:   # fără buclă (scripturi): direct
+        _append_traces(_take_pending())
+
+async def flush_traces(delay: float = 0):
+    """Scrie liniile adunate dintr-un thread: un open() la TRACE_FLUSH_S s, nu unul per update pe buclă."""
+    if delay: await asyncio.sleep(delay)
+    while TRACE_PENDING:
+        await asyncio.to_thread(_append_traces, _take_pending())
+
+def format_trace(d: dict, limit: int = 40) -> str:
+    lines = [f"{d['total_ms']:.0f} ms · {d['name']} {' '.join(f'{k}={v}' for k, v in (d.get('attrs') or {}).items())}"]
+    def walk(spans, depth):
+        for s in spans:
+            if len(lines) >= limit: return
+            ms = "…" if s["ms"] is None else f"{s['ms']:.1f}"
+            err = f" !{s['error']}" if s.get("error") else ""
+            lines.append(f"{'  ' * depth}+{s['at_ms']:.0f} {s['name']} {ms} ms{err}")
+            walk(s.get("spans", ()), depth + 1)
+    walk(d.get("spans", ()), 1)
+    return "\n".join(lines)
+
 # ==================== Mini‑CRM CSV ====================
 LOG_PATH = pathlib.Path("orders_log.csv")
+JOURNAL_PATH = pathlib.Path("orders_log.journal")
 FIELDNAMES = [
     "ts","req_id","user_id","username","full_name",
     "category","title","desc","budget_raw",
     "deadline","deadline_iso","contact",
     "status","assigned_dev_ids","started_ts","notes",
-    "topic_id","topic_link"
+    "topic_id","topic_link","roles"
 ]
-
+COMPACT_MIN = int(os.getenv("ORDERS_COMPACT_MIN", "1000"))
+FINISHED_STATUSES = {"finalizat_confirmat", "anulat"}
+ACTIVE_STATUSES = {"nou", "in_lucru"}   # ce apare ca „activ” în /my și în rezumate
+
+def join_note(prev: str, line: str) -> str:
+    prev = (prev or "").strip()
+    return (prev + "\n" + line).strip() if prev else line
+
+class OrderStore:
+    """Index în memorie req_id -> rând, cu persistență append-only.
+
+    orders_log.csv rămâne snapshot-ul (un rând per cerere): cererile noi se adaugă
+    la final, iar modificările ajung în jurnal (JSON lines) și sunt compactate
+    periodic înapoi în CSV. get/update sunt O(1), indiferent de mărimea logului.
+
+    Mai multe procese pot folosi aceleași fișiere: scrierile se fac sub file_lock, iar
+    la fiecare acces un stat pe CSV + jurnal arată dacă alt proces a scris între timp;
+    atunci se citește doar coada nouă (sau totul, dacă snapshot-ul a fost compactat).
+    Câmpurile modificate local și încă nescrise (`dirty`) nu sunt suprascrise de coadă.
+    """
+    def __init__(self, path: pathlib.Path, journal_path: pathlib.Path, compact_min: int = COMPACT_MIN):
+        self.path = path
+        self.journal_path = journal_path
+        self.compact_min = compact_min
+        self.rows = {}          # {req_id: {field: str}}
+        self.journal_len = 0
+        self.loaded = False
+        self.pending = {}       # {req_id: rând} inserate, încă nescrise în snapshot
+        self.dirty = {}         # {(req_id, câmp): n} patch-uri locale încă nescrise în jurnal
+        self.csv_ino = None; self.csv_off = 0           # până unde am citit snapshot-ul
+        self.journal_ino = None; self.journal_off = 0   # ... și jurnalul
+        self.seen = None        # (file_sig CSV, file_sig jurnal) la ultima sincronizare
+        self.pins = []          # fișierele citite, ținute deschise: inode-ul lor nu poate fi refolosit
+        self.compacted = None   # (mark, file_sig) după o compactare proprie, fără date străine
+        self.on_change = None   # callback(req_ids | None) pentru modificări scrise de alt proces
+
+    @staticmethod
+    def _blank():
+        return {k: "" for k in FIELDNAMES}
+
+    def _row(self, header, vals):
+        if header == FIELDNAMES:
+            nf = len(FIELDNAMES)
+            if len(vals) != nf: vals = (vals + [""] * nf)[:nf]
+            return dict(zip(FIELDNAMES, vals))
+        d = dict(zip(header, vals))   # snapshot cu alt set de coloane (ex. înainte de "roles")
+        return {k: d.get(k) or "" for k in FIELDNAMES}
+
+    def _patch(self, rows, line: bytes, dirty, changed=None):
+        """Aplică o linie din jurnal; câmpurile din `dirty` păstrează valoarea din memorie."""
+        try: rec = json.loads(line)
+        except ValueError: return False   # linie trunchiată la crash
+        rid = rec.pop("req_id", "")
+        if not rid: return False
+        row = rows.get(rid)
+        if row is None: row = rows[rid] = self._blank() | {"req_id": rid}
+        for k, v in rec.items():
+            if (rid, k) in dirty or row.get(k) == v: continue
+            row[k] = v
+            if changed is not None: changed.add(rid)
+        return True
+
+    def _read_journal(self, rows, start: int, dirty, changed=None):
+        """Liniile complete din jurnal de la `start`. Întoarce (offset final, nr. linii)."""
+        n = 0
+        try: f = self.journal_path.open("rb")
+        except FileNotFoundError: return start, 0
+        with f:
+            f.seek(start)
+            for raw in f:
+                if not raw.endswith(b"\n"): break   # scriere în curs / crash: o reluăm data viitoare
+                start += len(raw)
+                n += self._patch(rows, raw, dirty, changed)
+        return start, n
+
+    def _read_csv(self, rows, start: int, changed=None):
+        """Rândurile din snapshot de la `start`; cererile deja cunoscute sunt sărite. Întoarce offset-ul final."""
+        if not self.path.exists(): return start
+        header = FIELDNAMES
+        for off, vals in iter_csv_offsets(self.path, start):
+            if off == 0:
+                header = vals or FIELDNAMES; continue
+            if not vals: continue
+            r = self._row(header, vals)
+            if r["req_id"] and r["req_id"] not in rows:
+                rows[r["req_id"]] = r
+                if changed is not None: changed.add(r["req_id"])
+        return self.path.stat().st_size   # apelat sub lock: nimeni nu scrie între timp
+
+    def _pin(self):
+        for f in self.pins: f.close()
+        self.pins = []
+        if fcntl is None: return   # pe Windows un fișier deschis nu poate fi înlocuit prin rename
+        for p, ino in ((self.path, self.csv_ino), (self.journal_path, self.journal_ino)):
+            if ino is None: continue
+            try: f = p.open("rb")
+            except FileNotFoundError: continue
+            if os.fstat(f.fileno()).st_ino == ino: self.pins.append(f)
+            else: f.close()
+
+    @timed_io("orders_load")
+    def load(self, lock: bool = True):
+        rows = {}; header = FIELDNAMES
+        with file_lock(self.path, shared=True) if lock else contextlib.nullcontext():
+            csv_sig, j_sig = file_sig(self.path), file_sig(self.journal_path)
+            if csv_sig is not None:
+                with self.path.open("r", newline="", encoding="utf-8") as f:
+                    r = csv.reader(f)
+                    header = next(r, None) or FIELDNAMES
+                    i = FIELDNAMES.index("req_id")
+                    for vals in r:
+                        if header != FIELDNAMES: vals = [self._row(header, vals)[k] for k in FIELDNAMES]
+                        elif len(vals) != len(FIELDNAMES): vals = (vals + [""] * len(FIELDNAMES))[:len(FIELDNAMES)]
+                        if vals[i]: rows[vals[i]] = dict(zip(FIELDNAMES, vals))
+            j_off, n = self._read_journal(rows, 0, self.dirty)
+        # modificările locale încă nescrise rămân peste ce e pe disc
+        for (rid, k) in self.dirty:
+            old = self.rows.get(rid)
+            if old is not None and rid in rows: rows[rid][k] = old[k]
+        for rid, rec in self.pending.items(): rows[rid] = rec
+        self.rows = rows; self.journal_len = n; self.loaded = True
+        self.csv_ino, self.csv_off = csv_sig if csv_sig else (None, 0)
+        self.journal_ino = j_sig[0] if j_sig else None; self.journal_off = j_off
+        self.seen = (csv_sig, j_sig); self.compacted = None
+        self._pin(); self._csv_replaced()
+        if header != FIELDNAMES and lock: self.compact()   # aliniază header-ul înainte de append-uri
+
+    def _ensure(self):
+        if not self.loaded: self.load()
+        elif (file_sig(self.path), file_sig(self.journal_path)) != self.seen: self.refresh()
+
+    @timed_io("orders_refresh")
+    def refresh(self):
+        """Preia scrierile altor procese. Nu blochează: dacă alt proces scrie chiar acum,
+        reîncercăm la următorul acces."""
+        with file_lock(self.path, shared=True, blocking=False) as ok:
+            if not ok: return
+            changed = self._sync()
+        if changed is None or changed:
+            if self.on_change: self.on_change(changed)
+
+    def _sync(self):
+        """Corpul lui refresh(), cu lock-ul (shared sau exclusiv) deja luat.
+        Întoarce cererile schimbate de alte procese (None = reîncărcare completă)."""
+        seen = (file_sig(self.path), file_sig(self.journal_path))
+        csv_sig, j_sig = seen
+        if self.compacted:   # compactarea noastră: memoria e deja la zi, doar adoptăm fișierul nou
+            (ino, csv_off, j_off, _), sig = self.compacted; self.compacted = None
+            if (ino, csv_off, j_off) == (self.csv_ino, self.csv_off, self.journal_off) and csv_sig and csv_sig[0] == sig[0]:
+                self.csv_ino, self.csv_off = sig
+                self.journal_ino = None; self.journal_off = 0; self.journal_len = 0
+                self._pin(); self._csv_replaced()
+        replaced = (csv_sig is None) != (self.csv_ino is None) or (csv_sig and self.csv_ino is not None and (
+            csv_sig[0] != self.csv_ino or csv_sig[1] < self.csv_off))
+        if not replaced and self.journal_ino is not None:
+            replaced = j_sig is None or j_sig[0] != self.journal_ino or j_sig[1] < self.journal_off
+        if replaced:   # snapshot compactat / fișiere rescrise: reîncărcare completă
+            self.load(lock=False)
+            changed = None
+        else:
+            changed = set()
+            if csv_sig and csv_sig[1] > self.csv_off:
+                start = self.csv_off
+                self.csv_off = self._read_csv(self.rows, start, changed)
+                if self.csv_ino is None: self.csv_ino = csv_sig[0]
+                self._csv_grew(start)
+            if j_sig and j_sig[1] > self.journal_off:
+                self.journal_off, n = self._read_journal(self.rows, self.journal_off, self.dirty, changed)
+                self.journal_len += n
+                if self.journal_ino is None: self.journal_ino = j_sig[0]; self._pin()
+            self.seen = seen
+        return changed
+
+    def _csv_replaced(self): pass
+    def _csv_grew(self, start: int): pass
+
+    def get(self, req_id: str):
+        self._ensure()
+        return self.rows.get(req_id)
+
+    def all(self):
+        self._ensure()
+        return self.rows.values()
+
+    def insert(self, row: dict):
+        """Cerere nouă în index; pe disc ajunge prin write_batch (append în snapshot)."""
+        self._ensure()
+        rec = self._blank() | {k: ("" if v is None else str(v)) for k, v in row.items() if k in FIELDNAMES}
+        self.rows[rec["req_id"]] = rec
+        self.pending[rec["req_id"]] = rec
+        return rec
+
+    def update(self, req_id: str, fields: dict):
+        """Aplică patch-ul în index; întoarce patch-ul normalizat sau None."""
+        self._ensure()
+        rec = self.rows.get(req_id)
+        if rec is None: return None
+        patch = {k: ("" if v is None else str(v)) for k, v in fields.items() if k in FIELDNAMES}
+        rec.update(patch)
+        if req_id not in self.pending:
+            for k in patch: self.dirty[(req_id, k)] = self.dirty.get((req_id, k), 0) + 1
+        return patch
+
+    def mark_written(self, items):
+        """items: [(kind, req_id, data)] trimise cu write_batch (apelat din bucla principală)."""
+        for kind, rid, data in items:
+            if kind == "insert":
+                self.pending.pop(rid, None); continue
+            for k in data:
+                n = self.dirty.get((rid, k), 0) - 1
+                if n > 0: self.dirty[(rid, k)] = n
+                else: self.dirty.pop((rid, k), None)
+
+    @staticmethod
+    def _terminate(path: pathlib.Path, f, eol: str):
+        """Dacă un proces a murit la mijlocul unei linii, o închidem înainte de append."""
+        if f.tell() == 0: return
+        with path.open("rb") as r:
+            r.seek(-1, os.SEEK_END)
+            if r.read(1) != b"\n": f.write(eol)
+
+    @timed_io("orders_write")
+    def write_batch(self, inserts, patches):
+        """inserts: [rând]; patches: {req_id: patch}. Un singur append + fsync per fișier, sub lock."""
+        with file_lock(self.path):
+            if inserts:
+                with self.path.open("a", newline="", encoding="utf-8") as f:
+                    w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+                    if f.tell() == 0: w.writeheader()
+                    else: self._terminate(self.path, f, "\r\n")
+                    w.writerows(inserts)
+                    f.flush(); os.fsync(f.fileno())
+            if patches: self._append_journal(patches)
+
+    def _append_journal(self, patches):
+        """Append + fsync în jurnal; apelantul ține lock-ul exclusiv."""
+        with self.journal_path.open("a", encoding="utf-8") as f:
+            self._terminate(self.journal_path, f, "\n")
+            f.write("".join(json.dumps({"req_id": rid} | p, ensure_ascii=False) + "\n" for rid, p in patches.items()))
+            f.flush(); os.fsync(f.fileno())
+
+    @timed_io("orders_note")
+    def append_note(self, req_id: str, line: str):
+        """notes += line, citit și scris sub lock-ul exclusiv după ce preia scrierile altor procese,
+        deci două note simultane pe aceeași cerere nu se suprascriu. Scrie direct, nu prin
+        OrderWriter. None dacă cererea lipsește sau e încă nescrisă (doar în `pending`)."""
+        self._ensure()
+        if req_id in self.pending or req_id not in self.rows: return None
+        with file_lock(self.path):
+            changed = self._sync()
+            rec = self.rows.get(req_id)
+            if rec is not None:
+                rec["notes"] = join_note(rec["notes"], line)
+                self._append_journal({req_id: {"notes": rec["notes"]}})
+                self.journal_len += 1
+        if (changed is None or changed) and self.on_change: self.on_change(changed)
+        return rec["notes"] if rec is not None else None
+
+    def needs_compaction(self) -> bool:
+        self._ensure()   # journal_len numără și liniile scrise de alte procese
+        return self.journal_len >= max(self.compact_min, len(self.rows))
+
+    def replace_all(self, rows):
+        self.rows = {}; self.pending = {}; self.dirty = {}
+        for r in rows:
+            rid = r.get("req_id") or ""
+            if rid: self.rows[rid] = self._blank() | {k: ("" if r.get(k) is None else str(r.get(k))) for k in FIELDNAMES}
+        self.loaded = True
+        self.compact(([dict(r) for r in self.rows.values()], (None, 0, 0, frozenset())), force=True)
+
+    def snapshot(self):
+        """Copie pentru compactarea din thread: rândurile + poziția în fișiere la care corespund."""
+        self._ensure()
+        return [dict(r) for r in self.rows.values()], (self.csv_ino, self.csv_off, self.journal_off, frozenset(self.dirty))
+
+    @timed_io("orders_compact")
+    def compact(self, snap=None, force: bool = False):
+        """Rescrie snapshot-ul (temp + fsync + rename) și golește jurnalul, sub lock exclusiv.
+        Ce au scris alte procese după `snap` e aplicat peste copie înainte de rescriere;
+        dacă între timp alt proces a compactat deja, renunțăm (reîncărcăm la următorul acces).
+        `force` (replace_all) ignoră conținutul de pe disc."""
+        rows, mark = self.snapshot() if snap is None else snap
+        ino, csv_off, j_off, dirty = mark
+        with file_lock(self.path):
+            sig = file_sig(self.path)
+            merged = {r["req_id"]: r for r in rows}
+            foreign = False
+            if not force:
+                if sig is not None and ino is not None and sig[0] != ino: return False
+                n = len(merged)
+                self._read_csv(merged, csv_off if sig and ino is not None else 0)
+                _, nj = self._read_journal(merged, j_off, dirty)
+                foreign = len(merged) != n or nj > 0
+            atomic_write_csv(self.path, FIELDNAMES, merged.values())
+            self.journal_path.unlink(missing_ok=True)
+            new = file_sig(self.path)
+            self.compacted = None if foreign or force else (mark, new)
+        return True
+
+def atomic_write_csv(path: pathlib.Path, fieldnames, rows):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore"); w.writeheader()
+        w.writerows(rows)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+    try:
+        dfd = os.open(path.parent, os.O_RDONLY)
+        try: os.fsync(dfd)
+        finally: os.close(dfd)
+    except OSError:
+        pass
+
+
+def iter_csv_offsets(path: pathlib.Path, start: int = 0, end: int | None = None):
+    """(offset, valori) pentru fiecare rând CSV începând de la byte-ul `start`.
+    Câmpurile multi-linie (notes) sunt tratate corect: csv.reader cere linii doar la nevoie.
+    Cu `end` (coada unui fișier în care alt proces poate scrie) se citesc doar rândurile complete
+    până la `end`, iar ultimul element e (offset-ul primului byte necitit, None)."""
+    with path.open("rb") as f:
+        f.seek(start)
+        pos = start; cut = False
+        def lines():
+            nonlocal pos, cut
+            for raw in f:
+                if end is not None and (pos + len(raw) > end or not raw.endswith(b"\n")): break
+                pos += len(raw)
+                yield raw.decode("utf-8")
+            cut = True
+        r = csv.reader(lines())
+        while True:
+            off = pos
+            try: vals = next(r)
+            except StopIteration: vals = None
+            if end is not None and (vals is None or cut):   # rând terminat odată cu datele: neterminat
+                yield off, None; return
+            if vals is None: return
+            yield off, vals
+
+TSIDX_EVERY = int(os.getenv("TSIDX_EVERY", "256"))
+
+class TsIndex:
+    """Index rar ts -> offset pentru un CSV scris (de obicei) cronologic (o intrare la `every` rânduri).
+
+    Cheia unei intrări e ts-ul maxim al rândurilor *dinaintea* ei, deci seek(ts) nu
+    sare niciodată peste un rând cu ts >= ts cerut. `sorted` spune dacă tot fișierul e în
+    ordinea ts: doar atunci o scanare se poate opri la primul rând de după interval
+    (save_log / compactarea pot rescrie rândurile în altă ordine). Cu `path`, intrările se
+    păstrează pe disc și sunt refolosite cât timp CSV-ul e același fișier (inode-ul din prima
+    linie); rândurile adăugate după build se reindexează din coadă la load.
+    """
+    def __init__(self, path: pathlib.Path | None = None, every: int = TSIDX_EVERY):
+        self.path = path
+        self.every = every
+        self.clear()
+
+    def clear(self):
+        self.keys = []; self.offsets = []
+        self.n = 0; self.max_ts = ""; self.sorted = True
+
+    def add(self, ts: str, offset: int):
+        """Apelat pentru fiecare rând, în ordinea din fișier. Întoarce intrarea nouă sau None."""
+        entry = None
+        if self.n % self.every == 0:
+            entry = (self.max_ts, offset)
+            self.keys.append(self.max_ts); self.offsets.append(offset)
+        self.n += 1
+        if ts > self.max_ts: self.max_ts = ts
+        elif ts and ts < self.max_ts: self.sorted = False
+        return entry
+
+    def seek(self, ts: str):
+        """Offset de la care pot apărea rânduri cu ts >= `ts` (None dacă indexul e gol)."""
+        if not self.offsets: return None
+        i = max(bisect.bisect_left(self.keys, ts) - 1, 0)
+        return self.offsets[i]
+
+    def build(self, csv_path: pathlib.Path, ts_col: int = 0):
+        self.clear()
+        entries = []
+        if csv_path.exists():
+            for off, vals in iter_csv_offsets(csv_path):
+                if off == 0: continue   # header
+                e = self.add(vals[ts_col] if len(vals) > ts_col else "", off)
+                if e: entries.append(e)
+        if self.path and csv_path.exists():
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")   # alt proces poate construi același index
+            with tmp.open("w", encoding="utf-8") as f:
+                f.write(f"#\t{csv_path.stat().st_ino}\t{int(self.sorted)}\n")
+                f.writelines(f"{k}\t{o}\n" for k, o in entries)
+            os.replace(tmp, self.path)
+
+    def load(self, csv_path: pathlib.Path, ts_col: int = 0) -> bool:
+        """Reîncarcă de pe disc dacă e pentru același CSV; recuperează n/max_ts din coadă."""
+        self.clear()
+        try:
+            if self.path is None: return False
+            with self.path.open("r", encoding="utf-8") as f:
+                head = f.readline().rstrip("\n").split("\t")
+                if head[:2] != ["#", str(csv_path.stat().st_ino)] or len(head) != 3:
+                    return False   # CSV rescris (compactat) sau index vechi
+                self.sorted = head[2] == "1"
+                for line in f:
+                    k, o = line.rstrip("\n").split("\t")
+                    self.keys.append(k); self.offsets.append(int(o))
+        except (OSError, ValueError):
+            self.clear(); return False
+        if not self.offsets: return False
+        self.n = (len(self.offsets) - 1) * self.every
+        self.max_ts = self.keys[-1]
+        last = self.offsets.pop(); self.keys.pop()
+        for off, vals in iter_csv_offsets(csv_path, last):
+            self.add(vals[ts_col] if len(vals) > ts_col else "", off)
+        return True
+
+    def append(self, csv_path: pathlib.Path, start: int, ts_col: int = 0):
+        """Indexează (în memorie) rândurile adăugate în CSV de la `start` încolo."""
+        for off, vals in iter_csv_offsets(csv_path, start):
+            if off == 0: continue
+            self.add(vals[ts_col] if len(vals) > ts_col else "", off)
+
+# ===== Persistență (single writer) =====
+FLUSH_DELAY = float(os.getenv("ORDERS_FLUSH_DELAY", "0.05"))
+
+class OrderWriter:
+    """Task unic care scrie pe disc mutațiile din STORE.
+
+    Handler-ele modifică indexul imediat și primesc un Future (ack) rezolvat după
+    fsync. Rafalele pentru același req_id sunt comasate într-un singur patch.
+    Fără task pornit (scripturi, benchmark-uri), scrierea se face sincron.
+    """
+    def __init__(self, store: OrderStore, delay: float = FLUSH_DELAY):
+        self.store = store
+        self.delay = delay
+        self.queue = None
+        self.task = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    def submit(self, kind: str, req_id: str, data: dict):
+        if not self.running:
+            try:
+                if kind == "insert": self.store.write_batch([data], {})
+                else: self.store.write_batch([], {req_id: data})
+            finally:
+                self.store.mark_written([(kind, req_id, data)])
+            if self.store.needs_compaction(): self.store.compact()
+            return True
+        fut = asyncio.get_running_loop().create_future()
+        parent = CURRENT_SPAN.get()
+        if parent is not None: parent.trace.hold()
+        self.queue.put_nowait((kind, req_id, data, fut, parent))
+        return fut
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            if item is None: break
+            if self.delay: await asyncio.sleep(self.delay)
+            batch = [item]
+            stop = False
+            while not self.queue.empty():
+                nxt = self.queue.get_nowait()
+                if nxt is None: stop = True; break
+                batch.append(nxt)
+            await self._flush(batch)
+            if stop: break
+
+    async def _flush(self, batch):
+        inserts = {}; patches = {}; futs = []
+        t0 = time.perf_counter()
+        for kind, rid, data, fut, _parent in batch:
+            futs.append(fut)
+            if kind == "insert": inserts[rid] = dict(data)
+            elif rid in inserts: inserts[rid].update(data)
+            else: patches.setdefault(rid, {}).update(data)
+        try:
+            try: await asyncio.to_thread(self.store.write_batch, list(inserts.values()), patches)
+            finally:
+                self.store.mark_written([(kind, rid, data) for kind, rid, data, _, _ in batch])
+                self._trace(batch, t0)
+            if self.store.needs_compaction():
+                await asyncio.to_thread(self.store.compact, self.store.snapshot())
+        except Exception as e:
+            # indexul rămâne corect; următoarea compactare rescrie tot din memorie
+            print("[E] order writer:", repr(e))
+            for f in futs:
+                if not f.done(): f.set_exception(e)
+            return
+        for f in futs:
+            if not f.done(): f.set_result(True)
+
+    @staticmethod
+    def _trace(batch, t0: float):
+        """Scrierea comasată apare ca span (o dată) în trace-ul fiecărui update care a contribuit
+        la batch; hold() din submit() e per item, deci și release() e per item."""
+        t1 = time.perf_counter()
+        for parent in {id(p): p for *_, p in batch if p is not None}.values():
+            record_span(parent, "orders.write_batch", t0, t1, batch=len(batch))
+        for *_, p in batch:
+            if p is not None: p.trace.release()
+
+    async def close(self):
+        """Golește coada și oprește task-ul (apelat la shutdown)."""
+        if not self.running: return
+        self.queue.put_nowait(None)
+        await self.task
+
+
+@timed_io("load_log")
 def load_log():
-    rows=[]
-    if LOG_PATH.exists():
-        with LOG_PATH.open("r", newline="", encoding="utf-8") as f:
-            r=csv.DictReader(f); rows=list(r)
-    return rows
+    return [dict(r) for r in STORE.all()]
 
+@timed_io("save_log")
 def save_log(rows):
-    with LOG_PATH.open("w", newline="", encoding="utf-8") as f:
-        w=csv.DictWriter(f, fieldnames=FIELDNAMES); w.writeheader()
-        for row in rows:
-            base={k:row.get(k,"") for k in FIELDNAMES}; w.writerow(base)
+    STORE.replace_all(rows)
 
 def log_order(row: dict):
-    rows=load_log()
-    idx=next((i for i,x in enumerate(rows) if x.get("req_id")==row.get("req_id")), None)
-    if idx is None: rows.append({k:"" for k in FIELDNAMES}|row)
-    else: rows[idx].update(row)
-    save_log(rows)
+    """Întoarce un ack awaitable (sau True când writer-ul nu rulează)."""
+    rid = row.get("req_id")
+    if STORE.get(rid) is None:
+        return WRITER.submit("insert", rid, STORE.insert(row))
+    return WRITER.submit("update", rid, STORE.update(rid, row))
 
 def update_order(req_id: str, **fields):
-    rows=load_log()
-    idx=next((i for i,x in enumerate(rows) if x.get("req_id")==req_id), None)
-    if idx is None: return False
-    rows[idx].update({k:("" if v is None else str(v)) for k,v in fields.items()})
-    save_log(rows); return True
+    """False dacă req_id lipsește, altfel ack awaitable (sau True, sincron)."""
+    patch = STORE.update(req_id, fields)
+    if patch is None: return False
+    return WRITER.submit("update", req_id, patch)
+
+def append_order_note(req_id: str, line: str):
+    """Adaugă o linie la notes, atomic și între procese; întoarce notes-ul nou (None dacă lipsește)."""
+    notes = STORE.append_note(req_id, line)
+    if notes is None:   # cerere încă nescrisă pe disc: alt proces nu o vede, merge prin OrderWriter
+        r = STORE.get(req_id)
+        if r is None: return None
+        notes = join_note(r.get("notes") or "", line)
+        update_order(req_id, notes=notes)
+    return notes
 
 def get_order(req_id: str):
-    for r in load_log():
-        if r.get("req_id")==req_id: return r
-    return None
+    r = STORE.get(req_id)
+    return dict(r) if r is not None else None
 
 # ===== Earnings (ledger) =====
 EARN_PATH = pathlib.Path("earnings_log.csv")
 EARN_FIELDS = ["ts","req_id","dev_id","dev_username","amount","currency","note"]
+
+class EarningsLedger:
+    """Agregate în memorie peste earnings_log.csv, actualizate incremental.
+
+    Fișierul e citit o singură dată, apoi doar coada nouă (de la offset-ul salvat),
+    deci și rândurile adăugate de alt proces ajung în totaluri.
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.ino = None
+        self.fieldnames = EARN_FIELDS
+        self.by_dev = {}      # {dev_id: {"total", "currency", "finished", "by_cur": {cur: amt}}}
+        self.admin_days = {}  # {"YYYY-MM-DD": ({cur: amt}, rows)}; "" = ts invalid
+        self.admin_all = {}
+        self.admin_rows = 0
+        self.tsidx = TsIndex()
+
+    @timed_io("ledger_refresh")
+    def refresh(self):
+        sig = file_sig(self.path)
+        if sig is None:
+            if self.offset: self.reset()
+            return
+        ino, size = sig
+        if size < self.offset or (self.ino is not None and ino != self.ino): self.reset()   # fișier rescris/trunchiat
+        self.ino = ino
+        if size == self.offset: return
+        for off, vals in iter_csv_offsets(self.path, self.offset, size):   # doar rânduri complete
+            if vals is None:
+                self.offset = off; break
+            if off == 0:
+                self.fieldnames = vals or EARN_FIELDS
+            elif vals:
+                row = dict(zip(self.fieldnames, vals))
+                self.tsidx.add(row.get("ts") or "", off)
+                self._add(row)
+
+    def _add(self, row: dict):
+        dev = row.get("dev_id") or ""
+        try: amt = float(row.get("amount") or 0)
+        except ValueError: amt = None
+        agg = self.by_dev.get(dev)
+        if agg is None: agg = self.by_dev[dev] = {"total": 0.0, "currency": "EUR", "finished": 0, "by_cur": {}}
+        cur = row.get("currency") or "EUR"
+        if amt is not None:
+            agg["total"] += amt
+            agg["by_cur"][cur] = agg["by_cur"].get(cur, 0.0) + amt
+        agg["currency"] = cur; agg["finished"] += 1
+        if dev.upper() != "ADMIN": return
+        cur = cur.upper(); amt = amt or 0.0
+        ts = row.get("ts") or ""
+        try: day = datetime.datetime.fromisoformat(ts).date().isoformat()
+        except ValueError: day = ""
+        by_cur, n = self.admin_days.get(day) or ({}, 0)
+        by_cur[cur] = by_cur.get(cur, 0.0) + amt
+        self.admin_days[day] = (by_cur, n + 1)
+        self.admin_all[cur] = self.admin_all.get(cur, 0.0) + amt
+        self.admin_rows += 1
+
+    @timed_io("ledger_scan")
+    def _admin_since(self, cutoff: datetime.datetime):
+        """Rânduri ADMIN din ziua `cutoff` cu ts >= cutoff, citite prin seek în TsIndex."""
+        by_cur = {}; rows = 0
+        day = cutoff.date().isoformat()
+        off = self.tsidx.seek(day)
+        if off is None: return by_cur, rows
+        for o, vals in iter_csv_offsets(self.path, off):
+            if o >= self.offset: break
+            row = dict(zip(self.fieldnames, vals))
+            ts = row.get("ts") or ""
+            if ts[:10] > day:
+                if self.tsidx.sorted: break
+                continue
+            if ts[:10] < day or (row.get("dev_id") or "").upper() != "ADMIN": continue
+            try:
+                if datetime.datetime.fromisoformat(ts) < cutoff: continue
+            except ValueError:
+                continue   # ts invalid: deja numărat în bucket-ul ""
+            cur = (row.get("currency") or "EUR").upper()
+            try: amt = float(row.get("amount") or 0)
+            except ValueError: amt = 0.0
+            by_cur[cur] = by_cur.get(cur, 0.0) + amt
+            rows += 1
+        return by_cur, rows
+
+    def dev(self, dev_id):
+        self.refresh()
+        return self.by_dev.get(str(dev_id))
+
+    def admin(self, period_days: int | None = None):
+        self.refresh()
+        if not period_days: return dict(self.admin_all), self.admin_rows
+        today = datetime.date.today()
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=period_days)
+        first = cutoff.date()
+        by_cur, rows = self._admin_since(cutoff)   # ziua de la limită, exact, din fișier
+        for i in range(1, (today - first).days + 1):
+            b = self.admin_days.get((first + datetime.timedelta(days=i)).isoformat())
+            if b is None: continue
+            for cur, amt in b[0].items(): by_cur[cur] = by_cur.get(cur, 0.0) + amt
+            rows += b[1]
+        if "" in self.admin_days:   # ts neparsabil: inclus mereu, ca înainte
+            for cur, amt in self.admin_days[""][0].items(): by_cur[cur] = by_cur.get(cur, 0.0) + amt
+            rows += self.admin_days[""][1]
+        return by_cur, rows
+
+@timed_io("append_earning")
 def append_earning(req_id: str, dev_id: str, dev_username: str, amount: float, currency: str, note: str):
-    EARN_PATH.touch(exist_ok=True)
-    write_header = EARN_PATH.stat().st_size == 0
-    with EARN_PATH.open("a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=EARN_FIELDS)
-        if write_header: w.writeheader()
-        w.writerow({
-            "ts": now_iso(),"req_id": req_id,"dev_id": str(dev_id),
-            "dev_username": dev_username or "","amount": f"{amount:.2f}",
-            "currency": currency or "EUR","note": note or ""
-        })
+    STORE.add_earning({
+        "ts": now_iso(),"req_id": req_id,"dev_id": str(dev_id),
+        "dev_username": dev_username or "","amount": f"{amount:.2f}",
+        "currency": currency or "EUR","note": note or ""
+    })
 
 def dev_totals(dev_id: int):
-    total=0.0; currency="EUR"; finished=0
-    if not EARN_PATH.exists(): return 0.0, "EUR", 0
-    with EARN_PATH.open("r", newline="", encoding="utf-8") as f:
-        r=csv.DictReader(f)
-        for row in r:
-            if row.get("dev_id")==str(dev_id):
-                try: total += float(row.get("amount","0") or 0)
-                except: pass
-                currency = row.get("currency","EUR"); finished += 1
-    return total, currency, finished
+    return STORE.dev_totals(dev_id)
+
+# ===== Storage backends =====
+# STORAGE_BACKEND=csv (implicit) | sqlite. Ambele expun aceeași interfață pentru
+# OrderWriter și funcțiile CRM: get/all/active/between/insert/update/write_batch,
+# plus add_earning/dev_totals/admin_totals/admin_rows pentru ledger.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").lower()
+SQLITE_PATH = pathlib.Path(os.getenv("SQLITE_PATH", "crm.sqlite3"))
+
+class CsvBackend(OrderStore):
+    name = "csv"
+
+    def __init__(self, log_path: pathlib.Path, journal_path: pathlib.Path, earn_path: pathlib.Path):
+        super().__init__(log_path, journal_path)
+        self.earn_path = earn_path
+        self.ledger = EarningsLedger(earn_path)
+        self.tsidx = TsIndex(pathlib.Path(str(log_path) + ".tsidx"))
+        self.tsidx_ready = False
+
+    def _tsidx(self) -> TsIndex:
+        if not self.tsidx_ready:
+            with file_lock(self.path, shared=True):
+                if not self.tsidx.load(self.path): self.tsidx.build(self.path)
+            self.tsidx_ready = True
+        return self.tsidx
+
+    def _csv_replaced(self):
+        self.tsidx_ready = False   # offset-urile s-au schimbat; se reconstruiește la prima interogare
+
+    def _csv_grew(self, start: int):
+        if self.tsidx_ready: self.tsidx.append(self.path, start)   # rânduri noi (ale noastre sau ale altui proces)
+
+    def compact(self, snap=None, force: bool = False):
+        done = super().compact(snap, force)
+        if done and self.tsidx.path: self.tsidx.path.unlink(missing_ok=True)
+        return done
+
+    def count(self) -> int:
+        self._ensure()
+        return len(self.rows)
+
+    def active(self):
+        return [r for r in self.all() if (r.get("status") or "nou") not in FINISHED_STATUSES]
+
+    def index_rows(self):
+        """(req_id, status, assigned_dev_ids) pentru toate cererile — sursa indexurilor secundare."""
+        return [(r["req_id"], r.get("status") or "nou", r.get("assigned_dev_ids") or "") for r in self.all()]
+
+    def between(self, start: str, end: str):
+        """Cererile cu start <= ts[:10] < end (date ISO), în ordinea din fișier.
+        Sare direct la offset-ul din TsIndex; dacă fișierul e cronologic, citește doar până iese din interval."""
+        self._ensure()
+        idx = self._tsidx()
+        off = idx.seek(start)
+        seen = set()
+        if off is not None:
+            for _, vals in iter_csv_offsets(self.path, off):
+                day = vals[0][:10] if vals else ""
+                if day >= end:
+                    if idx.sorted: break
+                    continue
+                if not day or day < start or len(vals) < 2: continue
+                rid = vals[1]; seen.add(rid)
+                cur = self.rows.get(rid)   # versiunea curentă (jurnalul poate fi mai nou)
+                yield dict(cur) if cur is not None else dict(zip(FIELDNAMES, vals))
+        for rid, r in list(self.pending.items()):
+            if rid not in seen and r.get("ts") and start <= r["ts"][:10] < end: yield dict(r)
+
+    def add_earning(self, row: dict):
+        with file_lock(self.earn_path), self.earn_path.open("a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=EARN_FIELDS)
+            if f.tell() == 0: w.writeheader()
+            else: self._terminate(self.earn_path, f, "\r\n")
+            w.writerow(row)
+            f.flush(); os.fsync(f.fileno())
+        self.ledger.refresh()
+
+    def dev_totals(self, dev_id):
+        agg = self.ledger.dev(dev_id)
+        if not agg: return 0.0, "EUR", 0
+        return agg["total"], agg["currency"], agg["finished"]
+
+    def admin_totals(self, period_days: int | None = None):
+        return self.ledger.admin(period_days)
+
+    def admin_rows(self):
+        if not self.earn_path.exists(): return
+        with self.earn_path.open("r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if (row.get("dev_id") or "").upper() == "ADMIN": yield row
+
+# ts canonic în earnings: „YYYY-MM-DDTHH:MM:SS[.ffffff]”, comparabil ca text
+ISO_TS_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T[0-9][0-9]:[0-9][0-9]:[0-9][0-9]*"
+
+def norm_earn_ts(ts):
+    """ts-ul ISO canonic (și pentru formatul vechi „YYYY-MM-DD HH:MM”); ce nu se parsează rămâne neschimbat."""
+    try: return datetime.datetime.fromisoformat(ts).isoformat()
+    except (TypeError, ValueError): return ts
+
+class SqliteBackend:
+    """SQLite în mod WAL. Citirile merg direct în DB (indexat, vede și scrierile altor procese);
+    în memorie stau doar cererile modificate și încă nescrise de OrderWriter, peste rândurile din DB.
+    Interogările pe interval folosesc indexurile pe ts/status/dev_id."""
+    name = "sqlite"
+
+    def __init__(self, db_path: pathlib.Path):
+        self.db_path = db_path
+        self.conn = None
+        self.lock = threading.Lock()
+        self.pending = {}                         # {req_id: rând} încă nescris pe disc
+        self.unwritten = collections.Counter()    # {req_id: scrieri în coadă}; la 0 rândul iese din pending
+
+    def _ensure(self):
+        if self.conn is not None: return
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        cols = ", ".join(f"{k} TEXT NOT NULL DEFAULT ''" for k in FIELDNAMES if k != "req_id")
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS orders (req_id TEXT PRIMARY KEY, {cols});
+            CREATE INDEX IF NOT EXISTS orders_status ON orders(status);
+            CREATE INDEX IF NOT EXISTS orders_ts ON orders(ts);
+            CREATE TABLE IF NOT EXISTS earnings (
+                id INTEGER PRIMARY KEY, ts TEXT NOT NULL, req_id TEXT NOT NULL, dev_id TEXT NOT NULL,
+                dev_username TEXT NOT NULL DEFAULT '', amount REAL NOT NULL DEFAULT 0,
+                currency TEXT NOT NULL DEFAULT 'EUR', note TEXT NOT NULL DEFAULT '');
+            CREATE INDEX IF NOT EXISTS earnings_dev_ts ON earnings(dev_id, ts);
+            CREATE INDEX IF NOT EXISTS earnings_ts ON earnings(ts);
+        """)
+        # DB-uri importate înainte de normalizare: aducem ts-urile vechi la forma canonică
+        conn.create_function("norm_earn_ts", 1, norm_earn_ts, deterministic=True)
+        with conn:
+            conn.execute("UPDATE earnings SET ts = norm_earn_ts(ts) WHERE ts NOT GLOB ? AND norm_earn_ts(ts) != ts",
+                         (ISO_TS_GLOB,))
+        self.conn = conn
+
+    def _query(self, sql: str, args=()):
+        self._ensure()
+        with self.lock:
+            cur = self.conn.execute(sql, args)
+            return cur.fetchall(), [d[0] for d in cur.description or ()]
+
+    def _rows(self, sql: str, args=()):
+        """Rânduri din DB, suprascrise de versiunea nescrisă încă unde există."""
+        data, cols = self._query(sql, args)
+        out = []
+        for vals in data:
+            r = dict(zip(cols, vals))
+            out.append(self.pending.get(r["req_id"], r))
+        return out
+
+    def _overlay(self, rows, pred):
+        # cereri inserate în memorie, dar încă nescrise de OrderWriter
+        seen = {r["req_id"] for r in rows}
+        rows.extend(r for rid, r in self.pending.items() if rid not in seen and pred(r))
+        return rows
+
+    def get(self, req_id: str):
+        r = self.pending.get(req_id)
+        if r is None and req_id:
+            rows = self._rows("SELECT * FROM orders WHERE req_id = ?", (req_id,))
+            if rows: r = rows[0]
+        return r
+
+    def all(self):
+        return self._overlay(self._rows("SELECT * FROM orders ORDER BY rowid"), lambda r: True)
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM orders")[0][0][0]
+
+    def active(self):
+        fin = tuple(FINISHED_STATUSES)
+        rows = self._rows(f"SELECT * FROM orders WHERE status NOT IN ({','.join('?' * len(fin))})", fin)
+        return [r for r in self._overlay(rows, lambda r: True) if (r.get("status") or "nou") not in FINISHED_STATUSES]
+
+    def snapshot(self):
+        return []
+
+    def index_rows(self):
+        data, _ = self._query("SELECT req_id, status, assigned_dev_ids FROM orders")
+        out = {rid: (rid, st or "nou", devs) for rid, st, devs in data}
+        for rid, r in self.pending.items():   # versiunea din memorie e mai nouă
+            out[rid] = (rid, r.get("status") or "nou", r.get("assigned_dev_ids") or "")
+        return list(out.values())
+
+    def between(self, start: str, end: str):
+        rows = self._rows("SELECT * FROM orders WHERE ts >= ? AND ts < ? ORDER BY ts", (start, end))
+        return [r for r in self._overlay(rows, lambda r: True) if r.get("ts") and start <= r["ts"][:10] < end]
+
+    def insert(self, row: dict):
+        rec = OrderStore._blank() | {k: ("" if v is None else str(v)) for k, v in row.items() if k in FIELDNAMES}
+        self.pending[rec["req_id"]] = rec
+        self.unwritten[rec["req_id"]] += 1
+        return rec
+
+    def update(self, req_id: str, fields: dict):
+        rec = self.get(req_id)
+        if rec is None: return None
+        patch = {k: ("" if v is None else str(v)) for k, v in fields.items() if k in FIELDNAMES}
+        rec.update(patch)
+        self.pending[req_id] = rec
+        self.unwritten[req_id] += 1
+        return patch
+
+    def write_batch(self, inserts, patches):
+        self._ensure()
+        with self.lock, self.conn:
+            if inserts:
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO orders ({','.join(FIELDNAMES)}) VALUES ({','.join('?' * len(FIELDNAMES))})",
+                    [[r.get(k, "") for k in FIELDNAMES] for r in inserts])
+            for rid, p in patches.items():
+                if not p: continue
+                self.conn.execute(f"UPDATE orders SET {', '.join(f'{k} = ?' for k in p)} WHERE req_id = ?", [*p.values(), rid])
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def append_note(self, req_id: str, line: str):
+        """notes += line într-o tranzacție BEGIN IMMEDIATE (atomic față de alte procese)."""
+        self._ensure()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT notes FROM orders WHERE req_id = ?", (req_id,)).fetchone()
+                if row is None:
+                    self.conn.rollback(); return None
+                notes = join_note(row[0], line)
+                self.conn.execute("UPDATE orders SET notes = ? WHERE req_id = ?", (notes, req_id))
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback(); raise
+        rec = self.pending.get(req_id)
+        if rec is not None: rec["notes"] = notes
+        return notes
+
+    def mark_written(self, items):
+        for _kind, rid, _data in items:
+            self.unwritten[rid] -= 1
+            if self.unwritten[rid] <= 0:
+                del self.unwritten[rid]
+                self.pending.pop(rid, None)
+
+    def compact(self, snap=None, force: bool = False):
+        pass
+
+    def replace_all(self, rows):
+        self._ensure()
+        recs = [OrderStore._blank() | {k: ("" if r.get(k) is None else str(r.get(k))) for k in FIELDNAMES} for r in rows if r.get("req_id")]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM orders")
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO orders ({','.join(FIELDNAMES)}) VALUES ({','.join('?' * len(FIELDNAMES))})",
+                [[r[k] for k in FIELDNAMES] for r in recs])
+        self.pending = {}; self.unwritten.clear()
+
+    EARN_INSERT = "INSERT INTO earnings (ts, req_id, dev_id, dev_username, amount, currency, note) VALUES (?,?,?,?,?,?,?)"
+
+    @staticmethod
+    def _earn_vals(row: dict):
+        try: amt = float(row.get("amount") or 0)
+        except ValueError: amt = 0.0
+        return (norm_earn_ts(row.get("ts") or ""), row.get("req_id") or "", row.get("dev_id") or "",
+                row.get("dev_username") or "", amt, row.get("currency") or "EUR", row.get("note") or "")
+
+    def add_earning(self, row: dict):
+        self._ensure()
+        with self.lock, self.conn:
+            self.conn.execute(self.EARN_INSERT, self._earn_vals(row))
+
+    def replace_earnings(self, rows) -> int:
+        """Înlocuiește tot tabelul earnings într-o singură tranzacție."""
+        self._ensure()
+        vals = [self._earn_vals(r) for r in rows]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM earnings")
+            self.conn.executemany(self.EARN_INSERT, vals)
+        return len(vals)
+
+    def dev_totals(self, dev_id):
+        total, n = self._query("SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM earnings WHERE dev_id = ?", (str(dev_id),))[0][0]
+        if not n: return 0.0, "EUR", 0
+        cur = self._query("SELECT currency FROM earnings WHERE dev_id = ? ORDER BY id DESC LIMIT 1", (str(dev_id),))[0][0][0]
+        return float(total), cur, n
+
+    def admin_totals(self, period_days: int | None = None):
+        sql = "SELECT UPPER(currency), SUM(amount), COUNT(*) FROM earnings WHERE dev_id = 'ADMIN'"
+        args = ()
+        if period_days:   # ca în EarningsLedger: rândurile cu ts invalid intră în orice perioadă
+            sql += " AND (ts >= ? OR ts NOT GLOB ?)"
+            args = ((datetime.datetime.now() - datetime.timedelta(days=period_days)).isoformat(), ISO_TS_GLOB)
+        data, _ = self._query(sql + " GROUP BY 1", args)
+        return {r[0]: float(r[1]) for r in data}, sum(r[2] for r in data)
+
+    def admin_rows(self):
+        data, cols = self._query("SELECT ts, req_id, dev_id, dev_username, amount, currency, note FROM earnings WHERE dev_id = 'ADMIN' ORDER BY id")
+        for vals in data:
+            r = dict(zip(cols, vals)); r["amount"] = f"{r['amount']:.2f}"
+            yield r
+
+def make_backend():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(SQLITE_PATH)
+    return CsvBackend(LOG_PATH, JOURNAL_PATH, EARN_PATH)
+
+def import_csv_to_sqlite(db_path: pathlib.Path = SQLITE_PATH):
+    """Import one-shot: orders_log.csv (+ jurnal) și earnings_log.csv -> SQLite."""
+    src = CsvBackend(LOG_PATH, JOURNAL_PATH, EARN_PATH)
+    dst = SqliteBackend(db_path)
+    dst.replace_all(src.all())
+    n_earn = 0
+    if EARN_PATH.exists():
+        rows = []
+        with EARN_PATH.open("r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if (row.get("dev_id") or "").upper() == "ADMIN": row["dev_id"] = "ADMIN"
+                rows.append(row)
+        n_earn = dst.replace_earnings(rows)
+    print(f"[I] import: {dst.count()} cereri, {n_earn} rânduri earnings -> {db_path}")
+
+def _ts_date(ts: str):
+    try: return datetime.date.fromisoformat((ts or "")[:10])
+    except ValueError: return None
+
+def backfill_orders(dry_run: bool = False):
+    """Completează deadline_iso (termenele relative se socotesc de la ziua comenzii) și aduce
+    budget_raw la forma din formular („300 EUR”) pe cererile vechi. Se rescriu doar bugetele care
+    sunt o singură sumă cu valută opțională și înseamnă aceeași sumă (ex. „300 lei” -> „300 MDL”,
+    „10” -> „10 EUR”, dar nu „12.5 EUR”); intervalele, „~50$”, „Mdl” etc. rămân text liber."""
+    rows = list(STORE.all())
+    raw_budgets = [r.get("budget_raw") or "" for r in rows]
+    budgets = normalize_column(raw_budgets, lambda v: norm_amount_str(v) if _PLAIN_AMOUNT.fullmatch(v) else "")
+    deadlines = normalize_column([(r.get("deadline") or "", _ts_date(r.get("ts"))) for r in rows],
+                                 lambda p: parse_deadline_to_date(*p))
+    patches = {}; free_text = 0
+    for r, raw, b, d in zip(rows, raw_budgets, budgets, deadlines):
+        p = {}
+        if raw and not b: free_text += 1
+        elif b != raw and parse_amount_currency(b) == parse_amount_currency(raw): p["budget_raw"] = b
+        if d and not r.get("deadline_iso"): p["deadline_iso"] = d
+        if p: patches[r["req_id"]] = p
+    n_budget = sum("budget_raw" in p for p in patches.values())
+    n_deadline = sum("deadline_iso" in p for p in patches.values())
+    print(f"[I] backfill: {len(rows)} cereri; buget normalizat {n_budget}, deadline_iso completat {n_deadline}, "
+          f"buget lăsat ca text {free_text}" + (" (dry run)" if dry_run else ""))
+    if dry_run or not patches: return patches
+    for rid, p in patches.items(): STORE.update(rid, p)
+    STORE.write_batch([], patches)   # un singur append, nu câte un fsync per cerere
+    STORE.mark_written([("update", rid, p) for rid, p in patches.items()])
+    if STORE.needs_compaction(): STORE.compact()
+    return patches
+
+STORE = make_backend()
+WRITER = OrderWriter(STORE)
 
 # ===== Role & Permissions =====
 OWNER_ID = ADMIN_CHAT_ID
@@ -560,61 +2055,257 @@ def is_manager(uid): return is_owner(uid) or uid in ROLES["MANAGER"]
 def can_payout(uid): return is_owner(uid)  # doar OWNER pentru confirmare plăți
 
 def admin_totals(period_days: int | None = None):
-    by_cur = {}
-    rows_count = 0
-    if not EARN_PATH.exists():
-        return by_cur, rows_count
-    cutoff = None
-    if period_days:
-        cutoff = datetime.datetime.now() - datetime.timedelta(days=period_days)
-    with EARN_PATH.open("r", newline="", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            if (row.get("dev_id") or "").upper() != "ADMIN":
-                continue
-            ts = row.get("ts") or ""
-            if cutoff:
-                try:
-                    dt = datetime.datetime.fromisoformat(ts)
-                    if dt < cutoff:
-                        continue
-                except:
-                    pass
-            cur = (row.get("currency") or "EUR").upper()
-            try:
-                amt = float(row.get("amount") or 0)
-            except:
-                amt = 0.0
-            by_cur[cur] = by_cur.get(cur, 0.0) + amt
-            rows_count += 1
-    return by_cur, rows_count
+    """Comisioane ADMIN pe valută (toate / ultimele `period_days` zile)."""
+    return STORE.admin_totals(period_days)
 
 # ===== In‑Memory =====
-LAST_REQ = {}
-def allowed(user_id, window=30):
-    now=time.time()
-    if now - LAST_REQ.get(user_id, 0) < window: return False
-    LAST_REQ[user_id]=now; return True
+REQ_WINDOW = 30   # s între două cereri ale aceluiași client (vezi THROTTLE["order_contact"])
 
-REQ_INDEX = {}             # {req_id: {..., assigned_dev_ids:set(), roles:{dev_id:{role,pct}}, topic_id:int, topic_link:str}}
-CLAIMS = defaultdict(dict) # {req_id: {dev_id:{username,full_name}}}
-PAYOUT_CTX = {}            # {admin_id: {...}}
+def encode_roles(roles: dict) -> str:
+    return ";".join(f"{did}:{m['role']}:{m['pct']}" for did, m in roles.items())
+
+def decode_roles(raw: str) -> dict:
+    roles = {}
+    for part in (raw or "").split(";"):
+        try:
+            did, role, pct = part.split(":")
+            roles[int(did)] = {"role": role, "pct": int(pct)}
+        except ValueError:
+            continue
+    return roles
+
+def _int_or(x, default=0):
+    try: return int(x)
+    except (TypeError, ValueError): return default
+
+def req_info_from_row(r: dict) -> dict:
+    """Rând din STORE -> intrare REQ_INDEX."""
+    devs = [int(x) for x in (r.get("assigned_dev_ids") or "").split(",") if x.strip().lstrip("-").isdigit()]
+    roles = decode_roles(r.get("roles"))
+    if not roles and devs:  # rânduri vechi, fără coloana roles: primul dev e LEAD
+        roles = {d: {"role": "lead" if i == 0 else "helper", "pct": 100 if i == 0 else 0} for i, d in enumerate(devs)}
+    return {
+        "user_id": _int_or(r.get("user_id")), "username": r.get("username") or "", "full_name": r.get("full_name") or "",
+        "category": r.get("category") or "", "title": r.get("title") or "",
+        "desc": r.get("desc") or "", "budget_raw": r.get("budget_raw") or "",
+        "deadline": r.get("deadline") or "", "deadline_iso": r.get("deadline_iso") or "",
+        "contact": r.get("contact") or "", "status": r.get("status") or "nou",
+        "assigned_dev_ids": set(devs), "roles": roles, "started_ts": r.get("started_ts") or "", "notes": r.get("notes") or "",
+        "topic_id": _int_or(r.get("topic_id")), "topic_link": r.get("topic_link") or ""
+    }
+
+class ReqIndex(dict):
+    """REQ_INDEX cu încărcare leneșă: cererile închise se materializează din STORE la primul acces."""
+    def _load(self, req_id):
+        r = STORE.get(req_id)
+        if r is None: return None
+        info = req_info_from_row(r)
+        dict.__setitem__(self, req_id, info)
+        return info
+    def __missing__(self, req_id):
+        info = self._load(req_id)
+        if info is None: raise KeyError(req_id)
+        return info
+    def get(self, req_id, default=None):
+        if dict.__contains__(self, req_id): return dict.__getitem__(self, req_id)
+        info = self._load(req_id)
+        return default if info is None else info
+    def __contains__(self, req_id):
+        return dict.__contains__(self, req_id) or self._load(req_id) is not None
+
+REQ_INDEX = ReqIndex()     # {req_id: {..., assigned_dev_ids:set(), roles:{dev_id:{role,pct}}, topic_id:int, topic_link:str}}
+
+class SortedIds:
+    """Listă sortată de req_id (bisect): inserare/ștergere punctuală și pagini după cursor."""
+    __slots__ = ("ids",)
+    def __init__(self, ids=()):
+        self.ids = sorted(ids)
+
+    def add(self, rid: str):
+        i = bisect.bisect_left(self.ids, rid)
+        if i == len(self.ids) or self.ids[i] != rid: self.ids.insert(i, rid)
+
+    def discard(self, rid: str):
+        i = bisect.bisect_left(self.ids, rid)
+        if i < len(self.ids) and self.ids[i] == rid: del self.ids[i]
+
+    def after(self, cursor: str, n: int):
+        i = bisect.bisect_right(self.ids, cursor) if cursor else 0
+        return self.ids[i:i + n]
+
+    def before(self, cursor: str, n: int):
+        i = bisect.bisect_left(self.ids, cursor)
+        return self.ids[max(0, i - n):i]
+
+    def __len__(self):
+        return len(self.ids)
+
+class StatusIndex:
+    """{status: SortedIds} + `all` (toate cererile), actualizat la fiecare schimbare de status."""
+    def __init__(self):
+        self.by_status = {}
+        self.all = SortedIds()
+        self.where = {}   # {req_id: status curent}
+
+    def set(self, req_id: str, status: str):
+        status = status or "nou"
+        old = self.where.get(req_id)
+        if old == status: return
+        if old is not None: self.by_status[old].discard(req_id)
+        slot = self.by_status.get(status)
+        if slot is None: slot = self.by_status[status] = SortedIds()
+        slot.add(req_id); self.all.add(req_id)
+        self.where[req_id] = status
+
+    def rebuild(self, rows):
+        groups = defaultdict(list)
+        for rid, status, _devs in rows: groups[status or "nou"].append(rid)
+        self.by_status = {st: SortedIds(ids) for st, ids in groups.items()}
+        self.where = {rid: st for st, ids in groups.items() for rid in ids}
+        self.all = SortedIds(self.where)
+
+    def sources(self, statuses=None):
+        if statuses is None: return [self.all]
+        return [self.by_status[st] for st in statuses if st in self.by_status]
+
+class DevIndex:
+    """Index invers {dev_id: {"active": {req_id}, "finished": {req_id}}}.
+
+    Se construiește o dată din STORE (doar coloanele status/assigned_dev_ids, inclusiv
+    pentru cererile închise, care nu sunt în REQ_INDEX) și se actualizează prin `place`
+    la fiecare asignare și schimbare de status.
+    """
+    def __init__(self):
+        self.by_dev = {}
+        self.assigned = SortedIds()   # cererile cu cel puțin un dev (pentru picker-ul de roluri)
+
+    def place(self, req_id: str, dev_ids, status: str):
+        bucket, other = ("active", "finished") if (status or "nou") in ACTIVE_STATUSES else ("finished", "active")
+        if dev_ids: self.assigned.add(req_id)
+        for did in dev_ids:
+            slot = self.by_dev.get(did)
+            if slot is None: slot = self.by_dev[did] = {"active": set(), "finished": set()}
+            slot[other].discard(req_id); slot[bucket].add(req_id)
+
+    def sync(self, req_id: str):
+        """Re-plasează cererea după o modificare în REQ_INDEX (asignare / status)."""
+        info = REQ_INDEX.get(req_id)
+        if info: self.place(req_id, info.get("assigned_dev_ids") or (), info.get("status"))
+
+    def rebuild(self, rows):
+        self.by_dev = {}; self.assigned = SortedIds()
+        for rid, status, raw in rows:
+            if raw: self.place(rid, [int(x) for x in raw.split(",") if x.strip().lstrip("-").isdigit()], status)
+
+    def active(self, dev_id: int) -> set:
+        slot = self.by_dev.get(dev_id)
+        return slot["active"] if slot else set()
+
+    def finished(self, dev_id: int) -> set:
+        slot = self.by_dev.get(dev_id)
+        return slot["finished"] if slot else set()
+
+    def has(self, dev_id: int, req_id: str) -> bool:
+        slot = self.by_dev.get(dev_id)
+        return bool(slot) and (req_id in slot["active"] or req_id in slot["finished"])
+
+    def devs(self):
+        return self.by_dev.keys()
+
+DEV_INDEX = DevIndex()
+STATUS_INDEX = StatusIndex()
+
+def reindex(req_id: str):
+    """Propagă o modificare din REQ_INDEX (cerere nouă / asignare / status) în indexurile secundare;
+    cererile închise își eliberează claims-urile din memorie."""
+    info = REQ_INDEX.get(req_id)
+    if not info: return
+    STATUS_INDEX.set(req_id, info.get("status"))
+    DEV_INDEX.sync(req_id)
+    if (info.get("status") or "nou") in FINISHED_STATUSES: CLAIMS.spill(req_id)   # redeschisă => reîncărcate din fișier
+def foreign_changes(req_ids):
+    """STORE a preluat cereri scrise de alt proces: intrările REQ_INDEX deja încărcate se
+    actualizează pe loc, apoi indexurile secundare (req_ids=None: tot, după o reîncărcare)."""
+    if req_ids is None:
+        for rid, info in list(dict.items(REQ_INDEX)):
+            r = STORE.rows.get(rid)
+            if r is not None: info.update(req_info_from_row(r))
+        idx_rows = STORE.index_rows()
+        DEV_INDEX.rebuild(idx_rows); STATUS_INDEX.rebuild(idx_rows)
+        return
+    for rid in req_ids:
+        if dict.__contains__(REQ_INDEX, rid): dict.__getitem__(REQ_INDEX, rid).update(req_info_from_row(STORE.rows[rid]))
+        reindex(rid)
+
+STORE.on_change = foreign_changes
+# {req_id: {dev_id:{username,full_name}}} — doar cererile deschise; o cerere evacuată se reîncarcă din CLAIMS_PATH
+CLAIMS = BoundedCache("CLAIMS", int(os.getenv("STATE_MAX_CLAIMS", "10000")), default_factory=dict,
+                      loader=lambda rid: load_claims(rid))
+PAYOUT_CTX = BoundedCache("PAYOUT_CTX", 1000, ttl=float(os.getenv("PAYOUT_CTX_TTL", "3600")))   # {admin_id: {...}}; wizard-ele abandonate expiră
+
+# ===== Claims (persistent) =====
+CLAIMS_PATH = pathlib.Path("claims_log.csv")
+CLAIM_FIELDS = ["ts","req_id","dev_id","username","full_name"]
+
+@timed_io("append_claim")
+def append_claim(req_id: str, dev_id: int, username: str, full_name: str):
+    with file_lock(CLAIMS_PATH), CLAIMS_PATH.open("a", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=CLAIM_FIELDS)
+        if f.tell() == 0: w.writeheader()
+        w.writerow({"ts": now_iso(), "req_id": req_id, "dev_id": str(dev_id), "username": username or "", "full_name": full_name or ""})
+
+@timed_io("load_claims")
+def load_claims(req_id: str):
+    """Claims pentru o cerere deschisă, citite din CLAIMS_PATH (None dacă nu există / e închisă)."""
+    if STATUS_INDEX.where.get(req_id, "nou") in FINISHED_STATUSES or not CLAIMS_PATH.exists(): return None
+    out = {}
+    with file_lock(CLAIMS_PATH, shared=True), CLAIMS_PATH.open("r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("req_id") == req_id:
+                out[_int_or(row.get("dev_id"))] = {"username": row.get("username") or "", "full_name": row.get("full_name") or ""}
+    return out or None
+
+def hydrate_state():
+    """Reconstruiește REQ_INDEX (doar cererile active) și CLAIMS din fișiere."""
+    t0 = time.perf_counter()
+    rows = STORE.active()
+    t_store = time.perf_counter()
+    active = 0
+    for r in rows:
+        dict.__setitem__(REQ_INDEX, r["req_id"], req_info_from_row(r)); active += 1
+    claims = 0
+    if CLAIMS_PATH.exists():
+        with file_lock(CLAIMS_PATH, shared=True), CLAIMS_PATH.open("r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                rid = row.get("req_id") or ""
+                if not dict.__contains__(REQ_INDEX, rid): continue
+                CLAIMS[rid][_int_or(row.get("dev_id"))] = {"username": row.get("username") or "", "full_name": row.get("full_name") or ""}
+                claims += 1
+    LANG_STORE.load()
+    idx_rows = STORE.index_rows()
+    DEV_INDEX.rebuild(idx_rows); STATUS_INDEX.rebuild(idx_rows)
+    STORE.dev_totals("")   # încălzește agregatele ledger-ului
+    t1 = time.perf_counter()
+    print(f"[I] hydrate ({STORE.name}): {STORE.count()} cereri ({active} active, restul lazy), {claims} claims, "
+          f"{len(DEV_INDEX.by_dev)} devi asignați; "
+          f"store {1000*(t_store-t0):.0f} ms, total {1000*(t1-t0):.0f} ms")
 
 # ==================== Meniuri ====================
-def main_menu_kb(user_id: int):
-    L = LANGS[get_lang(user_id)]
+# Tastaturile depind doar de (limbă, categorie): se construiesc o singură dată în CATALOG,
+# cu fallback-ul la RO deja rezolvat. Handler-ele fac doar un lookup.
+def _build_main_menu(lang: str):
     rows = []
     for pid in CATEGORY_ORDER:
         # folosește fallback la RO dacă lipsește traducerea în limba curentă
-        cat = (LANGS[get_lang(user_id)]["cat"].get(pid)
+        cat = (LANGS[lang]["cat"].get(pid)
                or LANGS["ro"]["cat"].get(pid))
         if not cat: 
             continue
         rows.append([InlineKeyboardButton(text=cat["title"], callback_data=f"cat:{pid}")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
-def category_kb(pid: str, user_id: int):
-    L = LANGS[get_lang(user_id)]
+def _build_category_kb(lang: str, pid: str):
+    L = LANGS[lang]
     kb = InlineKeyboardBuilder()
     kb.button(text=L["btn_examples"], callback_data=f"examples:{pid}")
     kb.button(text=L["btn_ideas"],    callback_data=f"ideas:{pid}")
@@ -623,8 +2314,7 @@ def category_kb(pid: str, user_id: int):
     kb.adjust(1)
     return kb.as_markup()
 
-def ideas_kb(pid: str, user_id: int):
-    lang = get_lang(user_id)
+def _build_ideas_kb(lang: str, pid: str):
     items = IDEAS.get(lang, {}).get(pid, [])
     kb = InlineKeyboardBuilder()
     for it in items:
@@ -633,6 +2323,40 @@ def ideas_kb(pid: str, user_id: int):
     kb.adjust(1)
     return kb.as_markup()
 
+def build_catalog():
+    """{lang: {"L", "main_menu", "cats": {pid: {title, desc, examples, text, kb, ideas, ideas_text, ideas_kb}}}}"""
+    catalog = {}
+    for lang, L in LANGS.items():
+        cats = {}
+        for pid in dict.fromkeys(CATEGORY_ORDER + list(LANGS["ro"]["cat"])):
+            cat = L["cat"].get(pid) or LANGS["ro"]["cat"].get(pid)
+            if not cat: continue
+            ideas = tuple(MappingProxyType(dict(it)) for it in IDEAS.get(lang, {}).get(pid, []))
+            cats[pid] = MappingProxyType({
+                "title": cat["title"], "desc": cat["desc"], "examples": tuple(cat["examples"]),
+                "text": f"**{cat['title']}**\n{cat['desc']}\n\n{L.get('examples_header','Examples:')}\n• " + "\n• ".join(cat["examples"]),
+                "kb": _build_category_kb(lang, pid),
+                "ideas": ideas,
+                "ideas_text": f"💡 <b>{cat['title']}</b>\n{cat['desc']}\n\n{L.get('ideas_header','Ideas:')}",
+                "ideas_kb": _build_ideas_kb(lang, pid),
+            })
+        catalog[lang] = MappingProxyType({"L": L, "main_menu": _build_main_menu(lang), "cats": MappingProxyType(cats)})
+    return MappingProxyType(catalog)
+
+CATALOG = build_catalog()
+
+def main_menu_kb(user_id: int):
+    return CATALOG[get_lang(user_id)]["main_menu"]
+
+def category_kb(pid: str, user_id: int):
+    lang = get_lang(user_id)
+    c = CATALOG[lang]["cats"].get(pid)
+    return c["kb"] if c else _build_category_kb(lang, pid)
+
+def cat_title_for(pid: str, lang: str) -> str:
+    c = CATALOG[lang]["cats"].get(pid)
+    return c["title"] if c else pid.title()
+
 # ==================== FSM-uri ====================
 class OrderForm(StatesGroup):
     waiting_title   = State()
@@ -700,39 +2424,671 @@ async def id_here(m: Message):
         f"message_thread_id = {getattr(m, 'message_thread_id', None)}"
     )
 
+# ==================== Outbound: coadă de trimitere cu rate limit ====================
+# Toate apelurile bot.send_* / create_forum_topic trec prin OUTBOX: token bucket per chat
+# și global, priorități (răspunsurile către client înaintea notificărilor din grup),
+# reîncercare după TelegramRetryAfter și erori logate central (nu mai sunt înghițite).
+PRIO_CLIENT, PRIO_ADMIN, PRIO_GROUP, PRIO_BULK = 0, 1, 2, 3
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "25"))      # mesaje/s, total
+SEND_PRIVATE_RATE = float(os.getenv("SEND_PRIVATE_RATE", "1"))     # mesaje/s într-un chat privat
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))  # ~20/min într-un grup
+SEND_TOPIC_RATE = float(os.getenv("SEND_TOPIC_RATE", str(20 / 60)))  # create_forum_topic, separat de mesaje
+SEND_IDLE_SWEEP = 60.0   # s; cât de des se scot bucket-urile chat-urilor inactive
+SEND_BURST = int(os.getenv("SEND_BURST", "3"))
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "8"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "5"))
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "ts")
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate; self.burst = burst
+        self.tokens = burst; self.ts = time.monotonic()
+
+    def _fill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def wait_time(self, now: float) -> float:
+        self._fill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._fill(now); self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.ts) * self.rate >= self.burst
+
+class SendScheduler:
+    def __init__(self):
+        self.heap = []        # (prio, seq, item) gata de trimis
+        self.deferred = []    # (ready_at, prio, seq, item) — chat-ul nu are încă token / e în RetryAfter
+        self.seq = itertools.count()
+        # {(chat_id, lane): [TokenBucket, blocked_until, ocupat, [(prio, seq, item)] în așteptare]};
+        # un singur apel în zbor per chat/lane, ca mesajele să ajungă în ordinea cererii; cele inactive sunt scoase
+        self.chats = {}
+        self.parked = 0
+        self.swept = time.monotonic()
+        self.global_bucket = TokenBucket(SEND_GLOBAL_RATE, SEND_GLOBAL_RATE)
+        self.wake = None
+        self.task = None
+        self.sem = None
+        self.inflight = 0
+        self.stats_counts = {"sent": 0, "failed": 0, "retry_after": 0}
+        self.latencies = collections.deque(maxlen=1000)   # enqueue -> răspuns, secunde
+
+    def _chat(self, key):
+        c = self.chats.get(key)
+        if c is None:
+            chat_id, lane = key
+            rate = SEND_TOPIC_RATE if lane == "topic" else SEND_GROUP_RATE if int(chat_id) < 0 else SEND_PRIVATE_RATE
+            c = self.chats[key] = [TokenBucket(rate, SEND_BURST), 0.0, False, []]
+        return c
+
+    def _sweep(self, now: float):
+        """Un bucket plin, liber și fără RetryAfter activ e identic cu unul nou: poate fi scos."""
+        self.swept = now
+        for key in [k for k, (b, blocked, busy, _w) in self.chats.items() if not busy and blocked <= now and b.full(now)]:
+            del self.chats[key]
+
+    def _ensure_started(self):
+        if self.task is None or self.task.done():
+            self.wake = asyncio.Event()
+            self.sem = asyncio.Semaphore(SEND_CONCURRENCY)
+            self.task = asyncio.create_task(self._run())
+
+    def submit(self, method, chat_id, *args, priority: int = PRIO_GROUP, lane: str = "", **kwargs):
+        """Pune apelul `method(chat_id, *args, **kwargs)` în coadă; întoarce un Future cu rezultatul.
+        `lane` separă bucket-ul în același chat (ex. "topic": crearea topic-urilor nu stă după mesaje)."""
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_consume_future)
+        item = {"method": method, "chat_id": chat_id, "key": (chat_id, lane), "args": args, "kwargs": kwargs,
+                "fut": fut, "t0": time.monotonic(), "tries": 0, "span": CURRENT_SPAN.get()}
+        if item["span"] is not None: item["span"].trace.hold()
+        heapq.heappush(self.heap, (priority, next(self.seq), item))
+        self.wake.set()
+        return fut
+
+    async def send(self, method, chat_id, *args, priority: int = PRIO_GROUP, lane: str = "", **kwargs):
+        return await self.submit(method, chat_id, *args, priority=priority, lane=lane, **kwargs)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            if now - self.swept > SEND_IDLE_SWEEP: self._sweep(now)
+            while self.deferred and self.deferred[0][0] <= now:
+                _, prio, seq, item = heapq.heappop(self.deferred)
+                heapq.heappush(self.heap, (prio, seq, item))
+            if not self.heap:
+                timeout = self.deferred[0][0] - now if self.deferred else None
+                self.wake.clear()
+                try: await asyncio.wait_for(self.wake.wait(), timeout)
+                except asyncio.TimeoutError: pass
+                continue
+            prio, seq, item = heapq.heappop(self.heap)
+            if item["fut"].cancelled():   # apelantul a renunțat (ex. timeout la topic): nu mai trimitem
+                if item["span"] is not None: item["span"].trace.release()
+                continue
+            c = self._chat(item["key"])
+            if c[2]:   # chat-ul are deja un apel în zbor: așteaptă să se termine
+                c[3].append((prio, seq, item)); self.parked += 1
+                continue
+            bucket, blocked_until = c[0], c[1]
+            wait = max(bucket.wait_time(now), blocked_until - now)
+            if wait > 0:
+                heapq.heappush(self.deferred, (now + wait, prio, seq, item))
+                continue
+            gwait = self.global_bucket.wait_time(now)
+            if gwait > 0:
+                heapq.heappush(self.heap, (prio, seq, item))
+                await asyncio.sleep(gwait)
+                continue
+            bucket.take(now); self.global_bucket.take(now)
+            c[2] = True
+            await self.sem.acquire()
+            self.inflight += 1
+            asyncio.create_task(self._call(prio, seq, item))
+
+    async def _call(self, prio, seq, item):
+        fut = item["fut"]
+        token = CURRENT_SPAN.set(item["span"])   # apelul Bot API devine copil al update-ului care l-a cerut
+        try:
+            with span("outbox.send", chat_id=item["chat_id"], queued_ms=round((time.monotonic() - item["t0"]) * 1000, 1),
+                      tries=item["tries"]):
+                res = await item["method"](item["chat_id"], *item["args"], **item["kwargs"])
+        except TelegramRetryAfter as e:
+            self.stats_counts["retry_after"] += 1
+            item["tries"] += 1
+            if item["tries"] > SEND_MAX_RETRIES:
+                self._fail(item, e)
+            else:
+                ready = time.monotonic() + e.retry_after
+                self._chat(item["key"])[1] = ready
+                heapq.heappush(self.deferred, (ready, prio, seq, item))
+                self.wake.set()
+        except Exception as e:
+            self._fail(item, e)
+        else:
+            self.stats_counts["sent"] += 1
+            self.latencies.append(time.monotonic() - item["t0"])
+            if not fut.done(): fut.set_result(res)
+            if item["span"] is not None: item["span"].trace.release()
+        finally:
+            CURRENT_SPAN.reset(token)
+            self.inflight -= 1
+            self.sem.release()
+            c = self._chat(item["key"])
+            c[2] = False
+            if c[3]:   # înapoi în heap: (prio, seq) păstrează ordinea, următorul pleacă primul
+                for entry in c[3]: heapq.heappush(self.heap, entry)
+                self.parked -= len(c[3]); c[3].clear()
+                self.wake.set()
+
+    def _fail(self, item, e):
+        self.stats_counts["failed"] += 1
+        print(f"[W] send {getattr(item['method'], '__name__', item['method'])} -> {item['chat_id']}:", repr(e))
+        if not item["fut"].done(): item["fut"].set_exception(e)
+        if item["span"] is not None: item["span"].trace.release()
+
+    def depth(self) -> int:
+        return len(self.heap) + len(self.deferred) + self.parked
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+        pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] if lat else 0.0
+        return {"depth": self.depth(), "inflight": self.inflight, **self.stats_counts,
+                "latency_p50": pct(0.50), "latency_p95": pct(0.95), "latency_max": lat[-1] if lat else 0.0}
+
+def _consume_future(f: asyncio.Future):
+    # erorile sunt deja logate de OUTBOX; evită „exception was never retrieved” pentru fire-and-forget
+    if not f.cancelled(): f.exception()
+
+OUTBOX = SendScheduler()
+
+# ==================== Rate limit pe acțiuni ====================
+# Middleware interior (rulează doar când există handler): fiecare (user, acțiune) are un
+# TokenBucket. Acțiunea = prefixul callback_data („examples”, „claim”, ...) sau numele
+# handler-ului de mesaj („order_contact”); restul cad pe „cb” / „msg”.
+THROTTLE_MSG = "⏳ Prea repede, încearcă din nou în câteva secunde."
+THROTTLE = {
+    # acțiune: (tokeni/s, burst, mesaj)
+    "cb":            (2.0, 8, THROTTLE_MSG),            # navigare meniu
+    "msg":           (1.0, 5, THROTTLE_MSG),            # pașii formularului, comenzi
+    "examples":      (1 / 10, 3, THROTTLE_MSG),         # urcă media
+    "claim":         (1 / 5, 3, THROTTLE_MSG),
+    "order":         (1 / 60, 3, THROTTLE_MSG),         # începutul formularului
+    "order_contact": (1 / REQ_WINDOW, 1, "Aștepți puțin înainte de o nouă cerere, te rog. ⏳"),
+}
+# un cache per acțiune => TTL uniform, deci curățarea rămâne O(1); după burst/rate secunde
+# de liniște bucket-ul e oricum plin, așa că uitarea lui nu schimbă nimic
+THROTTLE_BUCKETS = {a: BoundedCache(f"THROTTLE[{a}]", STATE_MAX_USERS, ttl=burst / rate)
+                    for a, (rate, burst, _msg) in THROTTLE.items()}
+
+def throttle_action(event, data) -> str:
+    if isinstance(event, CallbackQuery):
+        prefix = (event.data or "").split(":", 1)[0]
+        return prefix if prefix in THROTTLE else "cb"
+    handler = data.get("handler")
+    name = getattr(getattr(handler, "callback", None), "__name__", "")
+    return name if name in THROTTLE else "msg"
+
+def throttle_hit(user_id: int, action: str):
+    """None dacă acțiunea e permisă, altfel [bucket, avertizat] pentru cheia blocată."""
+    rate, burst, _msg = THROTTLE[action]
+    cache = THROTTLE_BUCKETS[action]
+    ent = cache.get(user_id)
+    if ent is None: ent = cache[user_id] = [TokenBucket(rate, burst), False]
+    now = time.monotonic()
+    if ent[0].wait_time(now) > 0: return ent
+    ent[0].take(now); ent[1] = False
+    return None
+
+async def throttle_middleware(handler, event, data):
+    user = data.get("event_from_user")
+    if user is None or is_manager(user.id): return await handler(event, data)
+    action = throttle_action(event, data)
+    blocked = throttle_hit(user.id, action)
+    if blocked is None: return await handler(event, data)
+    msg = THROTTLE[action][2]
+    THROTTLED.inc(action)
+    if isinstance(event, CallbackQuery):
+        await event.answer(msg)            # răspuns imediat, fără handler
+    elif not blocked[1]:
+        blocked[1] = True                  # un singur avertisment până la următorul token
+        await event.answer(msg)
+
+THROTTLED = Counter("bot_throttled_total", "Update-uri oprite de throttling.", ("action",))
+
+rt.message.middleware(throttle_middleware)
+rt.callback_query.middleware(throttle_middleware)
+
+# ==================== Metrici: handler-e, Bot API, /metrics ====================
+# METRICS_PORT=0 dezactivează endpoint-ul; implicit ascultă doar pe 127.0.0.1.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+METRIC_PREFIXES = {"adm", "dev", "claim", "order"}
+METRICS_T0 = time.time()
+
+def metric_labels(event, data):
+    """(handler, prefix) — prefixul callback_data pentru adm:/dev:/claim:/order:, altfel cb/msg."""
+    handler = data.get("handler")
+    name = getattr(getattr(handler, "callback", None), "__name__", "?")
+    if isinstance(event, CallbackQuery):
+        p = (event.data or "").split(":", 1)[0]
+        return name, f"{p}:" if p in METRIC_PREFIXES else "cb"
+    return name, "msg"
+
+async def metrics_middleware(handler, event, data):
+    # interior, după throttle_middleware: măsoară doar update-urile care ajung la handler
+    t0 = time.perf_counter()
+    trace_note(handler=metric_labels(event, data)[0])
+    try:
+        return await handler(event, data)
+    except Exception as e:
+        HANDLER_ERRORS.inc(metric_labels(event, data)[0], type(e).__name__)
+        raise
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - t0, *metric_labels(event, data))
+
+rt.message.middleware(metrics_middleware)
+rt.callback_query.middleware(metrics_middleware)
+
+async def trace_middleware(handler, event: Update, data):
+    # exterior pe dp.update: rădăcina trace-ului cuprinde filtrele, throttling-ul și handler-ul
+    if not TRACE_ENABLED: return await handler(event, data)
+    user = data.get("event_from_user")
+    tr = Trace(f"update.{event.event_type}", {"update_id": event.update_id, **({"user": user.id} if user else {})})
+    token = CURRENT_SPAN.set(tr.root)
+    try:
+        return await handler(event, data)
+    except Exception as e:
+        tr.root.error = type(e).__name__; raise
+    finally:
+        tr.root.ms = (time.perf_counter() - tr.root.t0) * 1000
+        CURRENT_SPAN.reset(token)
+        tr.release()
+
+dp.update.outer_middleware(trace_middleware)
+
+async def api_metrics_middleware(make_request, bot, method):
+    name = type(method).__name__
+    t0 = time.perf_counter()
+    try:
+        with span(f"api.{name}"): return await make_request(bot, method)
+    except Exception as e:
+        API_ERRORS.inc(name, type(e).__name__)
+        raise
+    finally:
+        API_SECONDS.observe(time.perf_counter() - t0, name)
+
+def instrument_session(session):
+    """Cronometrează fiecare apel Bot API al sesiunii (și pentru sesiuni înlocuite în teste/bench)."""
+    session.middleware(api_metrics_middleware)
+    return session
+
+instrument_session(bot.session)
+
+def process_gauges():
+    out = [("bot_process_resident_memory_bytes", "RSS al procesului.", rss_bytes()),
+           ("bot_uptime_seconds", "Secunde de la pornire.", round(time.time() - METRICS_T0, 1)),
+           ("bot_background_tasks", "Task-uri de fan-out în curs.", len(BG_TASKS))]
+    s = OUTBOX.stats()
+    out += [("bot_outbox_depth", "Mesaje în coada OUTBOX.", s["depth"]),
+            ("bot_outbox_inflight", "Mesaje în curs de trimitere.", s["inflight"]),
+            ("bot_outbox_latency_p95_seconds", "Latența p95 coadă -> trimis.", round(s["latency_p95"], 6))]
+    out += [(f"bot_outbox_{k}_total", f"OUTBOX: {k}.", s[k]) for k in ("sent", "failed", "retry_after") if k in s]
+    out += [(f'bot_cache_entries{{cache="{c.name}"}}', "Intrări în cache-urile mărginite.", len(c)) for c in BOUNDED_CACHES]
+    return out
+
+METRIC_GAUGES.append(process_gauges)
+
+async def metrics_handler(request: web.Request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+async def start_metrics_server():
+    """Server aiohttp separat (merge și în polling); None dacă e dezactivat sau portul e ocupat."""
+    if not METRICS_PORT: return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    except OSError as e:   # ex. al doilea proces pe aceeași mașină
+        print(f"[W] metrics: nu pot asculta pe {METRICS_HOST}:{METRICS_PORT}: {e}")
+        await runner.cleanup(); return None
+    print(f"[I] metrics: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return runner
+
+# ==================== Media: index pe categorii ====================
+MEDIA_PAGE = 10   # Telegram acceptă max 10 într-un album
+
+class MediaIndex:
+    """{pid: (mtime_ns dir, [(path, kind, caption)])}.
+
+    Directorul e listat și clasificat o singură dată; la fiecare cerere se face doar
+    un stat() pe director, iar lista se reconstruiește numai când mtime-ul se schimbă.
+    Caption-ul unui fișier vine din `<fișier>.txt` alăturat, dacă există.
+    """
+    def __init__(self, dirs: dict):
+        self.dirs = dirs
+        self.cache = {}
+
+    def items(self, pid: str):
+        """None = categorie fără director media; [] = director gol/lipsă."""
+        media_dir = self.dirs.get(pid)
+        if not media_dir: return None
+        try: mtime = os.stat(media_dir).st_mtime_ns
+        except OSError: return []
+        hit = self.cache.get(pid)
+        if hit and hit[0] == mtime: return hit[1]
+        items = self._scan(media_dir)
+        self.cache[pid] = (mtime, items)
+        return items
+
+    @staticmethod
+    def _scan(media_dir: str):
+        items = []
+        for entry in sorted(os.scandir(media_dir), key=lambda e: e.name):
+            kind = media_kind(entry.name)
+            if not kind or not entry.is_file(): continue
+            cap = None
+            side = os.path.splitext(entry.path)[0] + ".txt"
+            if os.path.exists(side):
+                try: cap = pathlib.Path(side).read_text(encoding="utf-8").strip()[:1024] or None
+                except OSError: pass
+            items.append((entry.path, kind, cap))
+        return tuple(items)
+
+    def page(self, pid: str, page: int):
+        """(itemii paginii, pagina efectivă, număr de pagini); itemii sunt None dacă pid nu are media."""
+        items = self.items(pid)
+        if items is None: return None, 0, 0
+        pages = (len(items) + MEDIA_PAGE - 1) // MEDIA_PAGE
+        page = min(max(page, 0), max(pages - 1, 0))
+        return items[page * MEDIA_PAGE:(page + 1) * MEDIA_PAGE], page, pages
+
+MEDIA_INDEX = MediaIndex(MEDIA_DIRS)
+
+# ==================== Media: preview-uri (preprocesare offline) ====================
+# Originalele din MEDIA_DIRS (poze full-size, .MOV de cameră) sunt micșorate o singură dată
+# într-un ProcessPoolExecutor; rezultatele stau în MEDIA_PREVIEW_DIR, cu numele dat de
+# sha1(conținut + parametri). Manifestul {sursă: [size, mtime_ns, preview]} face rularea
+# incrementală: se reprocesează doar fișierele noi sau modificate.
+try:
+    from PIL import Image, ImageOps
+except ImportError:   # Pillow e opțional: fără el, pozele se trimit ca original
+    Image = None
+
+MEDIA_PREVIEW_DIR = pathlib.Path(os.getenv("MEDIA_PREVIEW_DIR", "media_cache"))
+PREVIEW_MAX_SIDE = int(os.getenv("PREVIEW_MAX_SIDE", "1280"))
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "82"))
+
+def _content_key(src: str, params: str) -> str:
+    h = hashlib.sha1(params.encode("utf-8"))
+    with open(src, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""): h.update(chunk)
+    return h.hexdigest()[:20]
+
+def _preview_image(src: str, out_dir: str, max_side: int, quality: int):
+    key = _content_key(src, f"img:{max_side}:{quality}")
+    dst = os.path.join(out_dir, key + ".jpg")
+    if os.path.exists(dst): return dst
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((max_side, max_side))
+        if im.mode not in ("RGB", "L"):
+            bg = Image.new("RGB", im.size, (255, 255, 255))
+            bg.paste(im, mask=im.convert("RGBA").split()[-1])
+            im = bg
+        tmp = dst + ".tmp"
+        im.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp, dst)
+    return dst
+
+def ffmpeg_transcoder(src: str, dst: str, max_side: int) -> bool:
+    """Transcoder implicit pentru video (H.264 + AAC, faststart)."""
+    exe = shutil.which("ffmpeg")
+    if not exe: return False
+    tmp = dst + ".tmp.mp4"
+    cmd = [exe, "-y", "-loglevel", "error", "-i", src,
+           "-vf", f"scale='min({max_side},iw)':-2", "-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+           "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart", tmp]
+    if subprocess.run(cmd, capture_output=True).returncode != 0:
+        pathlib.Path(tmp).unlink(missing_ok=True); return False
+    os.replace(tmp, dst)
+    return True
+
+# hook: (src, dst, max_side) -> bool; None = video trimis ca original
+VIDEO_TRANSCODER = ffmpeg_transcoder if shutil.which("ffmpeg") else None
+
+def _preview_video(src: str, out_dir: str, max_side: int, transcoder):
+    key = _content_key(src, f"vid:{max_side}")
+    dst = os.path.join(out_dir, key + ".mp4")
+    if os.path.exists(dst): return dst
+    return dst if transcoder(src, dst, max_side) else None
+
+class MediaPreviews:
+    def __init__(self, out_dir: pathlib.Path):
+        self.out_dir = out_dir
+        self.manifest_path = out_dir / "manifest.json"
+        self.manifest = None
+
+    def _ensure(self):
+        if self.manifest is not None: return
+        try: self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError): self.manifest = {}
+
+    def get(self, src: str) -> str:
+        """Preview-ul pentru `src` dacă e la zi, altfel originalul."""
+        self._ensure()
+        e = self.manifest.get(src)
+        if not e: return src
+        try:
+            st = os.stat(src)
+            if (e[0], e[1]) == (st.st_size, st.st_mtime_ns) and os.path.exists(e[2]): return e[2]
+        except OSError:
+            pass
+        return src
+
+    def _job(self, src: str, kind: str):
+        out = str(self.out_dir)
+        if kind == "photo" and Image is not None:
+            return _preview_image, (src, out, PREVIEW_MAX_SIDE, PREVIEW_JPEG_QUALITY)
+        if kind == "video" and VIDEO_TRANSCODER is not None:
+            return _preview_video, (src, out, PREVIEW_MAX_SIDE, VIDEO_TRANSCODER)
+        return None
+
+    def todo(self):
+        """[(src, stat, (fn, args))] pentru fișierele din MEDIA_INDEX fără preview la zi."""
+        self._ensure()
+        todo = []
+        for pid in MEDIA_DIRS:
+            for src, kind, _cap in MEDIA_INDEX.items(pid) or ():
+                if self.get(src) != src: continue
+                job = self._job(src, kind)
+                if job: todo.append((src, os.stat(src), job))
+        return todo
+
+    def run(self, max_workers: int | None = None) -> int:
+        """Procesează fișierele noi/modificate din MEDIA_INDEX; întoarce câte au fost (re)făcute.
+        Doar din `--preprocess-media`: pool-ul face fork, sigur doar într-un proces fără alte thread-uri."""
+        todo = self.todo()
+        if not todo: return 0
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        done = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as ex:
+            futs = {ex.submit(fn, *args): (src, st) for src, st, (fn, args) in todo}
+            for fut in concurrent.futures.as_completed(futs):
+                src, st = futs[fut]
+                try: dst = fut.result()
+                except Exception as e:
+                    print(f"[W] preview {src}:", repr(e)); continue
+                if dst:
+                    self.manifest[src] = [st.st_size, st.st_mtime_ns, dst]; done += 1
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+        return done
+
+PREVIEWS = MediaPreviews(MEDIA_PREVIEW_DIR)
+
+async def preprocess_media():
+    """Rulează `main.py --preprocess-media` ca proces separat: un fork al botului (bucla +
+    thread-urile lui) se poate bloca în lock-uri ținute de alte thread-uri."""
+    try: todo = await asyncio.to_thread(PREVIEWS.todo)
+    except OSError as e:
+        return print("[W] preprocess media:", repr(e))
+    if not todo: return
+    t0 = time.perf_counter()
+    try:
+        proc = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), "--preprocess-media")
+    except OSError as e:
+        return print("[W] preprocess media:", repr(e))
+    try: rc = await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill(); raise
+    if rc: return print(f"[W] preprocess media: ieșire {rc}")
+    PREVIEWS.manifest = None   # recitit de pe disc la următorul get()
+    print(f"[I] preview-uri media: gata în {time.perf_counter() - t0:.1f} s")
+
+# ==================== Media: cache file_id ====================
+# După primul upload, Telegram întoarce un file_id refolosibil; îl păstrăm pe disc,
+# legat de (path, size, mtime), ca să nu mai retrimitem aceiași bytes la fiecare click.
+MEDIA_CACHE_PATH = pathlib.Path(os.getenv("MEDIA_CACHE_PATH", "media_file_ids.json"))
+MEDIA_WARMUP_CHAT_ID = int(os.getenv("MEDIA_WARMUP_CHAT_ID", "0") or 0)
+
+MEDIA_KINDS = {
+    ".jpg": "photo", ".jpeg": "photo", ".png": "photo", ".webp": "photo",
+    ".mp4": "video", ".mov": "video", ".m4v": "video",
+    ".gif": "animation",
+    ".pdf": "document",
+}
+INPUT_MEDIA = {"photo": InputMediaPhoto, "video": InputMediaVideo, "animation": InputMediaAnimation, "document": InputMediaDocument}
+
+def media_kind(path: str):
+    return MEDIA_KINDS.get(os.path.splitext(path)[1].lower())
+
+class FileIdCache:
+    """{path: [size, mtime_ns, file_id]} persistat în JSON; intrările cu size/mtime vechi nu se folosesc."""
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.data = None
+
+    def _ensure(self):
+        if self.data is not None: return
+        try: self.data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError): self.data = {}
+
+    @staticmethod
+    def _sig(path: str):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def get(self, path: str):
+        self._ensure()
+        e = self.data.get(path)
+        try:
+            if e and (e[0], e[1]) == self._sig(path): return e[2]
+        except OSError:
+            pass
+        return None
+
+    def put_many(self, items):
+        """items: [(path, file_id)]"""
+        self._ensure()
+        for path, fid in items:
+            try: self.data[path] = [*self._sig(path), fid]
+            except OSError: continue
+        self.save()
+
+    def drop_many(self, paths):
+        self._ensure()
+        for p in paths: self.data.pop(p, None)
+        self.save()
+
+    def save(self):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+FILE_IDS = FileIdCache(MEDIA_CACHE_PATH)
+
+def _sent_file_id(msg: Message):
+    if msg.photo: return msg.photo[-1].file_id
+    for attr in ("video", "animation", "document"):
+        obj = getattr(msg, attr, None)
+        if obj: return obj.file_id
+    return None
+
+def _album(items, use_cache: bool = True):
+    """items: [(path, kind, caption)] -> (media, cached_paths)"""
+    media = []; cached = []
+    for path, kind, cap in items:
+        fid = FILE_IDS.get(path) if use_cache else None
+        if fid: cached.append(path)
+        media.append(INPUT_MEDIA[kind](media=fid or FSInputFile(path), caption=cap))
+    return media, cached
+
+async def send_album(chat_id: int, items, priority: int = PRIO_CLIENT):
+    """Trimite un album (max 10) refolosind file_id-urile din cache.
+    Un file_id expirat/invalid => se retrimite prin upload și se reîmprospătează cache-ul."""
+    media, cached = _album(items)
+    try:
+        msgs = await OUTBOX.send(bot.send_media_group, chat_id, media=media, priority=priority)
+    except TelegramBadRequest as e:
+        if not cached: raise
+        print("[W] file_id invalid, re-upload:", e)
+        FILE_IDS.drop_many(cached)
+        media, cached = _album(items, use_cache=False)
+        msgs = await OUTBOX.send(bot.send_media_group, chat_id, media=media, priority=priority)
+    fresh = [(path, _sent_file_id(msg)) for (path, _k, _c), msg in zip(items, msgs) if path not in cached]
+    if fresh: FILE_IDS.put_many([(p, fid) for p, fid in fresh if fid])
+    return msgs
+
+async def media_startup():
+    await preprocess_media()   # warmup-ul urcă deja preview-urile, nu originalele
+    await warmup_media()
+
+async def warmup_media():
+    """Urcă o dată toate fișierele din MEDIA_DIRS în MEDIA_WARMUP_CHAT_ID (chat privat) ca să umple cache-ul."""
+    if not MEDIA_WARMUP_CHAT_ID: return
+    todo = []
+    for pid in MEDIA_DIRS:
+        for p, kind, _cap in MEDIA_INDEX.items(pid) or ():
+            p = PREVIEWS.get(p)
+            if not FILE_IDS.get(p): todo.append((p, kind, None))
+    for i in range(0, len(todo), 10):
+        try: await send_album(MEDIA_WARMUP_CHAT_ID, todo[i:i + 10], priority=PRIO_BULK)
+        except Exception as e: print("[W] warmup media:", repr(e))
+    if todo: print(f"[I] warmup media: {len(todo)} fișiere urcate")
+
 # ==================== Catalog flow ====================
 @rt.callback_query(F.data == "back:menu")
 async def back_menu(cq: CallbackQuery):
-    L = LANGS[get_lang(cq.from_user.id)]
-    await cq.message.edit_text(L["menu_title"], reply_markup=main_menu_kb(cq.from_user.id))
+    C = CATALOG[get_lang(cq.from_user.id)]
+    await cq.message.edit_text(C["L"]["menu_title"], reply_markup=C["main_menu"])
     await cq.answer()
 
 @rt.callback_query(F.data.startswith("cat:"))
 async def open_category(cq: CallbackQuery):
     pid = cq.data.split(":")[1]
-    lang = get_lang(cq.from_user.id)
-    L = LANGS[lang]
-    cat = (L["cat"].get(pid) or LANGS["ro"]["cat"].get(pid))
+    cat = CATALOG[get_lang(cq.from_user.id)]["cats"].get(pid)
     if not cat:
         return await cq.answer("Category unavailable.", show_alert=True)
-    header = L.get("examples_header","Examples:")
-    text = f"**{cat['title']}**\n{cat['desc']}\n\n{header}\n• " + "\n• ".join(cat["examples"])
-    await cq.message.edit_text(text, parse_mode="Markdown", reply_markup=category_kb(pid, cq.from_user.id))
+    await cq.message.edit_text(cat["text"], parse_mode="Markdown", reply_markup=cat["kb"])
     await cq.answer()
 
 @rt.callback_query(F.data.startswith("ideas:"))
 async def open_ideas(cq: CallbackQuery):
     pid = cq.data.split(":")[1]
-    lang = get_lang(cq.from_user.id)
-    L = LANGS[lang]
-    cat = (L["cat"].get(pid) or LANGS["ro"]["cat"].get(pid))
+    cat = CATALOG[get_lang(cq.from_user.id)]["cats"].get(pid)
     if not cat:
         return await cq.answer("Category unavailable.", show_alert=True)
-    items = IDEAS.get(lang, {}).get(pid, [])
-    if not items:
+    if not cat["ideas"]:
         return await cq.answer("Nu avem încă idei aici.", show_alert=True)
-    text = f"💡 <b>{cat['title']}</b>\n{cat['desc']}\n\n{L.get('ideas_header','Ideas:')}"
-    await cq.message.edit_text(text, parse_mode="HTML", reply_markup=ideas_kb(pid, cq.from_user.id))
+    await cq.message.edit_text(cat["ideas_text"], parse_mode="HTML", reply_markup=cat["ideas_kb"])
     await cq.answer()
 
 @rt.callback_query(F.data.startswith("idea:"))
@@ -759,39 +3115,29 @@ async def open_one_idea(cq: CallbackQuery):
 
 @rt.callback_query(F.data.startswith("examples:"))
 async def show_examples(cq: CallbackQuery):
-    pid = cq.data.split(":")[1]
+    parts = cq.data.split(":")
+    pid = parts[1]
+    page = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 0
     lang = get_lang(cq.from_user.id)
     L = LANGS[lang]
-    media_dir = MEDIA_DIRS.get(pid)
-    if not media_dir:
+    items, page, pages = MEDIA_INDEX.page(pid, page)
+    if items is None:
         return await cq.answer("No media configured.", show_alert=True)
-
-    paths = sorted(glob.glob(os.path.join(media_dir, "*")))
-    if not paths:
+    if not items:
         await cq.answer("No media yet. Check back soon.", show_alert=True)
         return
 
-    cat_title = (L["cat"].get(pid, {}) or LANGS["ro"]["cat"].get(pid, {})).get("title") or pid.title()
-
-    media = []
-    for i, p in enumerate(paths[:10]):  # Telegram acceptă max 10 într-un album
-        ext = os.path.splitext(p)[1].lower()
-        cap = cat_title if i == 0 else None
-        if ext in (".jpg", ".jpeg", ".png", ".webp"):
-            media.append(InputMediaPhoto(media=FSInputFile(p), caption=cap))
-        elif ext in (".mp4", ".mov", ".m4v"):
-            media.append(InputMediaVideo(media=FSInputFile(p), caption=cap))
-        elif ext in (".gif",):
-            media.append(InputMediaAnimation(media=FSInputFile(p), caption=cap))
-        elif ext in (".pdf",):
-            media.append(InputMediaDocument(media=FSInputFile(p), caption=cap))
-        else:
-            continue
-
-    if media:
-        await bot.send_media_group(chat_id=cq.message.chat.id, media=media)
-
-    await cq.message.answer(L["menu_title"], reply_markup=category_kb(pid, cq.from_user.id))
+    cat_title = cat_title_for(pid, lang)
+    head = f"{cat_title} ({page + 1}/{pages})" if pages > 1 else cat_title
+    album = [(PREVIEWS.get(p), kind, f"{head}\n{cap}" if i == 0 and cap else (head if i == 0 else cap))
+             for i, (p, kind, cap) in enumerate(items)]
+    await send_album(cq.message.chat.id, album)
+
+    kb = category_kb(pid, cq.from_user.id)
+    if page + 1 < pages:
+        more = [InlineKeyboardButton(text=L["btn_more_media"], callback_data=f"examples:{pid}:{page + 1}")]
+        kb = InlineKeyboardMarkup(inline_keyboard=[more, *kb.inline_keyboard])
+    await cq.message.answer(L["menu_title"], reply_markup=kb)
     await cq.answer()
 
 # ==================== Validare buget/deadline ====================
@@ -809,7 +3155,7 @@ async def start_order(cq: CallbackQuery, state: FSMContext):
     lang = get_lang(uid)
     L = LANGS[lang]
     # titlul categoriei în limba curentă (fallback la RO)
-    cat_title = (L["cat"].get(pid, {}) or LANGS["ro"]["cat"].get(pid, {})).get("title", pid.title())
+    cat_title = cat_title_for(pid, lang)
     await state.update_data(category_id=pid, category_title=cat_title)
     await state.set_state(OrderForm.waiting_title)
     await cq.message.answer(f"📝 **{cat_title}**\n{L['ask_title']}", parse_mode="Markdown")
@@ -853,9 +3199,6 @@ async def order_deadline(m: Message, state: FSMContext):
 async def order_contact(m: Message, state: FSMContext):
     user_id = m.from_user.id
     L = LANGS[get_lang(user_id)]
-    if not allowed(user_id):
-        return await m.answer("Aștepți puțin înainte de o nouă cerere, te rog. ⏳")
-
     await state.update_data(contact=(m.text or "").strip())
     data = await state.get_data()
     await state.clear()
@@ -869,8 +3212,7 @@ async def order_contact(m: Message, state: FSMContext):
     buget_grup = calc_group_budget_text(buget_real)
     client_hash = sha1_hex(str(uid) + os.getenv("HASH_SALT","salt"))
 
-    # Log + index
-    log_order({
+    row = {
         "ts": now_iso(), "req_id": req_id,
         "user_id": str(uid), "username": m.from_user.username or "", "full_name": full_name,
         "category": data.get('category_title') or "",
@@ -879,8 +3221,7 @@ async def order_contact(m: Message, state: FSMContext):
         "deadline": data.get('deadline') or "", "deadline_iso": data.get('deadline_iso') or "",
         "contact": data.get('contact') or "", "status": "nou",
         "assigned_dev_ids": "", "started_ts": "", "notes": "", "topic_id":"", "topic_link":""
-    })
-
+    }
     REQ_INDEX[req_id] = {
         "user_id": uid, "username": m.from_user.username or "", "full_name": full_name,
         "category": data.get('category_title') or "", "title": data.get('title') or "",
@@ -890,8 +3231,11 @@ async def order_contact(m: Message, state: FSMContext):
         "assigned_dev_ids": set(), "roles": {}, "started_ts": "", "notes": "",
         "topic_id": 0, "topic_link": ""
     }
+    reindex(req_id)
+    # salvată imediat: assign/status/notițe pe cerere merg chiar dacă topic-ul încă se creează
+    log_order(row)
 
-    # 1) DM client + buton Contact admin
+    # 1) DM client + buton Contact admin — primul, înainte de orice altă rețea
     contact_admin_kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📬 Contact admin", url=f"tg://user?id={ADMIN_CHAT_ID}")]
     ])
@@ -907,20 +3251,70 @@ async def order_contact(m: Message, state: FSMContext):
     )
     await m.answer(summary_client, parse_mode="HTML")
 
-    # 2) Creează topic în grup (forum)
-    topic_id = 0; topic_link = ""
+    # 2-4) topic, grup, admin — în fundal; clientul nu le mai așteaptă
+    background(order_fanout(req_id, uname, uid, client_hash, buget_real, buget_grup))
+
+# ===== Fan-out comandă nouă (în fundal) =====
+ORDER_TOPIC_TIMEOUT = float(os.getenv("ORDER_TOPIC_TIMEOUT", "15"))   # s; după atât salvăm fără topic
+FANOUT_RETRIES = 3
+BG_TASKS = set()
+
+def background(coro):
+    """Pornește un job în fundal; referința e ținută până la final (main() le așteaptă la oprire)."""
+    parent = CURRENT_SPAN.get()
+    if parent is not None:   # trace-ul update-ului rămâne deschis până termină și job-ul
+        parent.trace.hold()
+        coro = _traced(coro, f"bg.{coro.__name__}")
+    t = asyncio.create_task(coro)
+    BG_TASKS.add(t); t.add_done_callback(BG_TASKS.discard)
+    if parent is not None: t.add_done_callback(lambda _t: parent.trace.release())
+    return t
+
+async def _traced(coro, name: str):
+    with span(name): return await coro
+
+async def with_retries(make_call, what: str, tries: int = FANOUT_RETRIES,
+                       retry_on=(TelegramNetworkError, TelegramServerError)):
+    """Reîncearcă doar erorile tranzitorii (rețea/5xx); RetryAfter e tratat deja de OUTBOX."""
+    for attempt in range(1, tries + 1):
+        try:
+            return await make_call()
+        except retry_on as e:
+            if attempt == tries: raise
+            print(f"[W] {what}: încercarea {attempt} a eșuat:", repr(e))
+            await asyncio.sleep(2 ** attempt)
+
+async def _create_topic(req_id: str, topic_title: str):
+    # create_forum_topic nu e idempotent: după o eroare de rețea topicul poate exista deja,
+    # deci reîncercăm doar pe 5xx
     try:
-        if DEV_GROUP_ID:
-            topic_title = f"#{req_id} – {REQ_INDEX[req_id]['title'][:40]}"
-            ft = await bot.create_forum_topic(chat_id=DEV_GROUP_ID, name=topic_title)
-            topic_id = ft.message_thread_id
-            cid = chat_id_to_cid(DEV_GROUP_ID)
-            topic_link = f"https://t.me/c/{cid}/{topic_id}"
-            REQ_INDEX[req_id]["topic_id"] = topic_id
-            REQ_INDEX[req_id]["topic_link"] = topic_link
-            update_order(req_id, topic_id=str(topic_id), topic_link=topic_link)
-    except TelegramBadRequest as e:
-        print("[W] create_forum_topic:", e)
+        ft = await with_retries(lambda: OUTBOX.send(bot.create_forum_topic, DEV_GROUP_ID, name=topic_title,
+                                                    priority=PRIO_GROUP, lane="topic"),
+                                "create_forum_topic", retry_on=(TelegramServerError,))
+    except Exception as e:
+        print("[W] create_forum_topic:", repr(e))
+        return 0, ""
+    topic_id = ft.message_thread_id
+    topic_link = f"https://t.me/c/{chat_id_to_cid(DEV_GROUP_ID)}/{topic_id}"
+    if req_id in REQ_INDEX:
+        REQ_INDEX[req_id]["topic_id"] = topic_id
+        REQ_INDEX[req_id]["topic_link"] = topic_link
+    update_order(req_id, topic_id=str(topic_id), topic_link=topic_link)   # doar câmpurile topic-ului
+    return topic_id, topic_link
+
+async def create_order_topic(req_id: str, title: str):
+    """(topic_id, topic_link) sau (0, "") dacă nu există grup / crearea eșuează / întârzie.
+    Topicul se salvează la cerere chiar dacă răspunsul vine după ORDER_TOPIC_TIMEOUT."""
+    if not DEV_GROUP_ID: return 0, ""
+    job = background(_create_topic(req_id, f"#{req_id} – {title[:40]}"))
+    try:
+        return await asyncio.wait_for(asyncio.shield(job), ORDER_TOPIC_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"[W] create_forum_topic: timeout pentru #{req_id}; topicul se salvează când răspunde Telegram")
+        return 0, ""
+
+async def order_fanout(req_id, uname, uid, client_hash, buget_real, buget_grup):
+    topic_id, topic_link = await create_order_topic(req_id, REQ_INDEX[req_id]['title'])
 
     # 3) Mesaj în topic pentru devs
     dev_summary = (
@@ -940,15 +3334,6 @@ async def order_contact(m: Message, state: FSMContext):
         kb.button(text="💬 Deschide discuția", url=topic_link)
     kb.adjust(1)
 
-    try:
-        if DEV_GROUP_ID:
-            if topic_id:
-                await bot.send_message(DEV_GROUP_ID, dev_summary, parse_mode="HTML", reply_markup=kb.as_markup(), message_thread_id=topic_id)
-            else:
-                await bot.send_message(DEV_GROUP_ID, dev_summary, parse_mode="HTML", reply_markup=kb.as_markup())
-    except Exception as e:
-        print("[E] send to group:", repr(e))
-
     # 4) Admin (buget real)
     admin_summary = (
         "🔒 <b>Detalii cerere (ADMIN)</b>\n"
@@ -960,8 +3345,18 @@ async def order_contact(m: Message, state: FSMContext):
         f"⏳ Termen: {esc(REQ_INDEX[req_id]['deadline'])} ({REQ_INDEX[req_id]['deadline_iso']})\n"
         f"🔗 Topic: {topic_link or 'n/a'}"
     )
+
+    # grupul și adminul sunt independente => în paralel
+    jobs = []
+    if DEV_GROUP_ID:
+        jobs.append(with_retries(lambda: OUTBOX.send(bot.send_message, DEV_GROUP_ID, dev_summary, parse_mode="HTML",
+                                                     reply_markup=kb.as_markup(), message_thread_id=topic_id or None,
+                                                     priority=PRIO_GROUP), "send to group"))
     if ADMIN_CHAT_ID:
-        await bot.send_message(ADMIN_CHAT_ID, admin_summary, parse_mode="HTML", disable_web_page_preview=True)
+        jobs.append(with_retries(lambda: OUTBOX.send(bot.send_message, ADMIN_CHAT_ID, admin_summary, parse_mode="HTML",
+                                                     disable_web_page_preview=True, priority=PRIO_ADMIN), "send to admin"))
+    for res in await asyncio.gather(*jobs, return_exceptions=True):
+        if isinstance(res, Exception): print("[E] order fan-out:", repr(res))
 
 # ==================== Claim ====================
 @rt.callback_query(F.data.startswith("claim:"))
@@ -973,6 +3368,7 @@ async def on_claim(callback: CallbackQuery):
         return await callback.answer("Cererea nu mai este înregistrată.", show_alert=True)
 
     CLAIMS[req_id][dev.id] = {"username": dev.username or "", "full_name": dev.full_name or ""}
+    append_claim(req_id, dev.id, dev.username or "", dev.full_name or "")
 
     if ADMIN_CHAT_ID:
         dev_name = fmt_username(dev)
@@ -981,7 +3377,7 @@ async def on_claim(callback: CallbackQuery):
             f"🆔 Cerere: <b>{req_id}</b>\n"
             f"👨‍💻 Dev: {esc(dev_name)} (ID: <code>{dev.id}</code>)"
         )
-        await bot.send_message(ADMIN_CHAT_ID, text_admin, parse_mode="HTML")
+        OUTBOX.submit(bot.send_message, ADMIN_CHAT_ID, text_admin, parse_mode="HTML", priority=PRIO_ADMIN)
 
     await callback.answer("Interes înregistrat. Adminul decide asignarea.")
 
@@ -1031,39 +3427,124 @@ async def adm_funds(cq: CallbackQuery):
 async def export_admin(m: Message):
     if not is_admin(m.from_user.id):
         return
-    if not EARN_PATH.exists():
-        return await m.answer("Nu există încă înregistrări de comision.")
     out = pathlib.Path("export_admin_commissions.csv")
-    with EARN_PATH.open("r", newline="", encoding="utf-8") as fin, out.open("w", newline="", encoding="utf-8") as fout:
-        r = csv.DictReader(fin)
+    with out.open("w", newline="", encoding="utf-8") as fout:
         w = csv.DictWriter(fout, fieldnames=EARN_FIELDS)
         w.writeheader()
         rows = 0
-        for row in r:
-            if (row.get("dev_id") or "").upper() == "ADMIN":
-                w.writerow(row); rows += 1
-    if out.exists() and out.stat().st_size > 0:
+        for row in STORE.admin_rows():
+            w.writerow(row); rows += 1
+    if rows:
         await m.answer_document(FSInputFile(out), caption="Export comisioane ADMIN")
     else:
         await m.answer("Nu am găsit linii de tip ADMIN în earnings_log.")
 
-def list_requests_buttons(filter_func=None):
-    items=[]
-    for rid, inf in sorted(REQ_INDEX.items()):
-        if filter_func and not filter_func(rid, inf): continue
-        title = (inf.get("title") or "-")[:18]
-        st = inf.get("status","nou")
-        items.append((f"{rid} · {title} · {st}", rid))
-    return items
+@rt.message(Command("outbox"))
+async def outbox_stats(m: Message):
+    if not is_admin(m.from_user.id): return
+    s = OUTBOX.stats()
+    await m.answer(
+        "📤 <b>Outbox</b>\n"
+        f"• În coadă: {s['depth']} (în zbor: {s['inflight']})\n"
+        f"• Trimise: {s['sent']} | eșuate: {s['failed']} | RetryAfter: {s['retry_after']}\n"
+        f"• Latență p50/p95/max: {s['latency_p50']:.2f}s / {s['latency_p95']:.2f}s / {s['latency_max']:.2f}s",
+        parse_mode="HTML")
+
+@rt.message(Command("mem"))
+async def mem_stats(m: Message):
+    if not is_admin(m.from_user.id): return
+    lines = [f"🧠 <b>Memorie</b> — RSS {rss_bytes() / 2**20:.1f} MiB"]
+    for c in BOUNDED_CACHES:
+        st = c.stats()
+        ttl = f"{st['ttl']:.0f}s" if st["ttl"] else "—"
+        lines.append(f"• {c.name}: {st['len']}/{st['maxsize']} (ttl {ttl}), ~{st['bytes'] / 1024:.0f} KiB, "
+                     f"evacuate {st['evicted']}, expirate {st['expired']}")
+    lines.append(f"• REQ_INDEX: {dict.__len__(REQ_INDEX)} încărcate, {len(STATUS_INDEX.all)} în index; "
+                 f"DEV_INDEX: {len(DEV_INDEX.by_dev)} devi")
+    await m.answer("\n".join(lines), parse_mode="HTML")
+
+@rt.message(Command("traces"))
+async def traces_cmd(m: Message):
+    """/traces [n] — cele mai lente n update-uri recente; /traces file — ring buffer-ul ca JSONL."""
+    if not is_admin(m.from_user.id): return
+    arg = ((m.text or "").split(maxsplit=1)[1:] or [""])[0].strip()
+    recent = list(TRACES)
+    if not recent: return await m.answer("Niciun trace înregistrat încă.")
+    if arg == "file":
+        data = "".join(json.dumps(d, ensure_ascii=False) + "\n" for d in recent).encode("utf-8")
+        return await m.answer_document(BufferedInputFile(data, filename="traces.jsonl"), caption=f"{len(recent)} trace-uri")
+    n = max(1, min(int(arg) if arg.isdigit() else 5, 20))
+    slow = sorted(recent, key=lambda d: -d["total_ms"])[:n]
+    body = "\n\n".join(format_trace(d, limit=max(8, 60 // n)) for d in slow)
+    await m.answer(f"🐢 <b>Cele mai lente {len(slow)} din {len(recent)}</b>\n<pre>{esc(body)[:3800]}</pre>", parse_mode="HTML")
+
+# ===== Picker-e paginate =====
+# Fiecare picker citește o singură pagină din STATUS_INDEX / DEV_INDEX.assigned (bisect după
+# cursor), iar cursorul (primul/ultimul req_id afișat) călătorește în callback_data:
+# adm:pg:<picker>:<n|p>:<cursor>.
+PICK_PAGE = 8
+PICKERS = {
+    # nume: (titlu, sursa: statusuri | None = toate | "assigned", prefix callback, mesaj gol, etichetă completă)
+    "assign":  ("🎯 Alege cererea pentru asignare:", ("nou",), "adm:assign:req", "Nu există cereri noi.", True),
+    "adddev":  ("➕ Alege cererea:", ("nou", "in_lucru"), "adm:adddev:req", "Niciun proiect potrivit.", True),
+    "role":    ("👥 Alege cererea:", "assigned", "adm:role:req", "Nicio cerere asignată.", True),
+    "status":  ("📊 Alege cererea:", None, "adm:status:req", "Nu există cereri.", True),
+    "details": ("🧾 Alege cererea:", None, "adm:details:req", "Nu există cereri.", False),
+    "comment": ("💬 Alege cererea:", None, "adm:comment:req", "Nu există cereri.", False),
+}
+
+def _pick_sources(src):
+    return [DEV_INDEX.assigned] if src == "assigned" else STATUS_INDEX.sources(src)
+
+def page_req_ids(sources, cursor: str = "", direction: str = "n", n: int = PICK_PAGE):
+    """(req_ids, are_anterior, are_următor) — maxim n id-uri din fiecare sursă, interclasate."""
+    if direction == "p" and cursor:
+        ids = list(heapq.merge(*(src.before(cursor, n) for src in sources)))[-n:]
+    else:
+        ids = list(heapq.merge(*(src.after(cursor, n) for src in sources)))[:n]
+    if not ids: return [], False, False
+    has_prev = any(src.before(ids[0], 1) for src in sources)
+    has_next = any(src.after(ids[-1], 1) for src in sources)
+    return ids, has_prev, has_next
+
+def picker_markup(name: str, cursor: str = "", direction: str = "n"):
+    """None dacă nu există nicio cerere pentru picker."""
+    _title, src, prefix, _empty, full = PICKERS[name]
+    sources = _pick_sources(src)
+    ids, has_prev, has_next = page_req_ids(sources, cursor, direction)
+    if not ids and cursor: ids, has_prev, has_next = page_req_ids(sources)   # pagina a dispărut între timp
+    if not ids: return None
+    rows = []
+    for rid in ids:
+        text = rid
+        if full:
+            inf = REQ_INDEX.get(rid) or {}
+            text = f"{rid} · {(inf.get('title') or '-')[:18]} · {inf.get('status','nou')}"
+        rows.append([InlineKeyboardButton(text=text, callback_data=f"{prefix}:{rid}")])
+    nav = []
+    if has_prev: nav.append(InlineKeyboardButton(text="⬅️", callback_data=f"adm:pg:{name}:p:{ids[0]}"))
+    if has_next: nav.append(InlineKeyboardButton(text="➡️", callback_data=f"adm:pg:{name}:n:{ids[-1]}"))
+    if nav: rows.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+async def show_picker(cq: CallbackQuery, name: str, cursor: str = "", direction: str = "n"):
+    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
+    title, _src, _prefix, empty, _full = PICKERS[name]
+    kb = picker_markup(name, cursor, direction)
+    if kb is None: return await cq.answer(empty, show_alert=True)
+    await cq.message.edit_text(title, reply_markup=kb)
+    await cq.answer()
+
+@rt.callback_query(F.data.startswith("adm:pg:"))
+async def adm_picker_page(cq: CallbackQuery):
+    _, _, name, direction, cursor = cq.data.split(":", 4)
+    if name not in PICKERS: return await cq.answer()
+    await show_picker(cq, name, cursor, direction)
 
 # Assign (LEAD 100% implicit)
 @rt.callback_query(F.data == "adm:assign")
 async def adm_assign_pick_req(cq: CallbackQuery):
-    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    req_ids = list_requests_buttons(lambda rid,inf: (inf.get("status") or "nou")=="nou")
-    if not req_ids: return await cq.answer("Nu există cereri noi.", show_alert=True)
-    await cq.message.edit_text("🎯 Alege cererea pentru asignare:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=t, callback_data=f"adm:assign:req:{rid}") ] for t,rid in req_ids]))
+    await show_picker(cq, "assign")
 
 @rt.callback_query(F.data.startswith("adm:assign:req:"))
 async def adm_assign_pick_dev(cq: CallbackQuery):
@@ -1095,33 +3576,30 @@ async def adm_assign_do(cq: CallbackQuery):
     info["assigned_dev_ids"].add(dev_id)
     info["roles"][dev_id] = {"role":"lead","pct":100}
     if not info.get("started_ts"): info["started_ts"] = now_iso()
-    REQ_INDEX[req_id] = info
+    REQ_INDEX[req_id] = info; reindex(req_id)
     update_order(req_id,
         assigned_dev_ids=",".join(str(x) for x in info["assigned_dev_ids"]),
+        roles=encode_roles(info["roles"]),
         status="in_lucru", started_ts=info["started_ts"])
 
     # Preview către client
-    try:
-        lead_text = f"👨‍💻 Lead dev: {dev_display}\nETA: {info.get('deadline_iso') or info.get('deadline')}"
-        await bot.send_message(info["user_id"], f"✅ Proiectul tău #{req_id} a intrat în lucru.\n{lead_text}", parse_mode="HTML")
-    except: pass
+    lead_text = f"👨‍💻 Lead dev: {dev_display}\nETA: {info.get('deadline_iso') or info.get('deadline')}"
+    OUTBOX.submit(bot.send_message, info["user_id"], f"✅ Proiectul tău #{req_id} a intrat în lucru.\n{lead_text}", parse_mode="HTML", priority=PRIO_CLIENT)
 
     # Mesaj în topic
-    try:
-        topic_id = info.get("topic_id") or 0
-        text_group = f"🆔 {req_id}: asignat LEAD către {dev_display} (status: in_lucru)."
-        kb = InlineKeyboardBuilder()
-        if info.get("topic_link"):
-            kb.button(text="💬 Deschide discuția", url=info["topic_link"])
-        kb.button(text="📊 Status",   callback_data=f"dev:status:req:{req_id}")
-        kb.button(text="🗒️ Comment", callback_data=f"dev:comment:req:{req_id}")
-        kb.button(text="⏫ 25%", callback_data=f"dev:progress:{req_id}:25")
-        kb.button(text="⏫ 50%", callback_data=f"dev:progress:{req_id}:50")
-        kb.button(text="⏫ 75%", callback_data=f"dev:progress:{req_id}:75")
-        kb.adjust(2)
-        await bot.send_message(DEV_GROUP_ID, text_group, parse_mode="HTML", message_thread_id=topic_id or None, reply_markup=kb.as_markup())
-    except Exception as e:
-        print("[W] assign->group:", e)
+    topic_id = info.get("topic_id") or 0
+    text_group = f"🆔 {req_id}: asignat LEAD către {dev_display} (status: in_lucru)."
+    kb = InlineKeyboardBuilder()
+    if info.get("topic_link"):
+        kb.button(text="💬 Deschide discuția", url=info["topic_link"])
+    kb.button(text="📊 Status",   callback_data=f"dev:status:req:{req_id}")
+    kb.button(text="🗒️ Comment", callback_data=f"dev:comment:req:{req_id}")
+    kb.button(text="⏫ 25%", callback_data=f"dev:progress:{req_id}:25")
+    kb.button(text="⏫ 50%", callback_data=f"dev:progress:{req_id}:50")
+    kb.button(text="⏫ 75%", callback_data=f"dev:progress:{req_id}:75")
+    kb.adjust(2)
+    OUTBOX.submit(bot.send_message, DEV_GROUP_ID, text_group, parse_mode="HTML", message_thread_id=topic_id or None,
+                  reply_markup=kb.as_markup(), priority=PRIO_GROUP)
 
     await cq.message.edit_text(f"✅ Asignat LEAD: {req_id} → {dev_display}")
     await cq.answer()
@@ -1129,10 +3607,7 @@ async def adm_assign_do(cq: CallbackQuery):
 # Add co-dev (procent)
 @rt.callback_query(F.data == "adm:adddev")
 async def adm_adddev_pick_req(cq: CallbackQuery, state: FSMContext):
-    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    reqs = list_requests_buttons(lambda rid,inf: (inf.get("status") or "nou") in {"nou","in_lucru"})
-    if not reqs: return await cq.answer("Niciun proiect potrivit.", show_alert=True)
-    await cq.message.edit_text("➕ Alege cererea:", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=t, callback_data=f"adm:adddev:req:{rid}") ] for t,rid in reqs]))
+    await show_picker(cq, "adddev")
 
 @rt.callback_query(F.data.startswith("adm:adddev:req:"))
 async def adm_adddev_pick_dev(cq: CallbackQuery, state: FSMContext):
@@ -1176,25 +3651,20 @@ async def set_helper_percent(m: Message, state: FSMContext):
     left = max(0, 100 - total_other)
     pct = min(pct, left if left>0 else pct)
     info["roles"][dev_id] = {"role":"helper","pct":pct}
-    REQ_INDEX[req_id]=info
-    update_order(req_id, assigned_dev_ids=",".join(str(x) for x in info["assigned_dev_ids"]))
+    REQ_INDEX[req_id]=info; reindex(req_id)
+    update_order(req_id, assigned_dev_ids=",".join(str(x) for x in info["assigned_dev_ids"]), roles=encode_roles(info["roles"]))
     await state.clear()
 
     meta = CLAIMS.get(req_id, {}).get(dev_id, {})
     dev_display = fmt_username_from_parts(meta.get("username",""), meta.get("full_name",""), dev_id)
-    try:
-        topic_id = info.get("topic_id") or None
-        await bot.send_message(DEV_GROUP_ID, f"➕ Co‑dev {dev_display} adăugat la #{req_id} ({pct}%).", parse_mode="HTML", message_thread_id=topic_id)
-    except: pass
+    OUTBOX.submit(bot.send_message, DEV_GROUP_ID, f"➕ Co‑dev {dev_display} adăugat la #{req_id} ({pct}%).", parse_mode="HTML",
+                  message_thread_id=info.get("topic_id") or None, priority=PRIO_GROUP)
     await m.answer(f"✅ Co‑dev setat: {dev_display} ({pct}%) pentru #{req_id}.")
 
 # Roluri
 @rt.callback_query(F.data == "adm:role")
 async def adm_role_pick_req(cq: CallbackQuery):
-    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    reqs = list_requests_buttons(lambda rid,inf: len(inf.get("assigned_dev_ids") or [])>0)
-    if not reqs: return await cq.answer("Nicio cerere asignată.", show_alert=True)
-    await cq.message.edit_text("👥 Alege cererea:", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=t, callback_data=f"adm:role:req:{rid}") ] for t,rid in reqs]))
+    await show_picker(cq, "role")
 
 @rt.callback_query(F.data.startswith("adm:role:req:"))
 async def adm_role_show(cq: CallbackQuery):
@@ -1213,10 +3683,7 @@ async def adm_role_show(cq: CallbackQuery):
 # Status & payout
 @rt.callback_query(F.data == "adm:status")
 async def adm_status_pick_req(cq: CallbackQuery):
-    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    req_ids = list_requests_buttons()
-    if not req_ids: return await cq.answer("Nu există cereri.", show_alert=True)
-    await cq.message.edit_text("📊 Alege cererea:", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=t, callback_data=f"adm:status:req:{rid}") ] for t,rid in req_ids]))
+    await show_picker(cq, "status")
 
 @rt.callback_query(F.data.startswith("adm:status:req:"))
 async def adm_status_pick_state(cq: CallbackQuery):
@@ -1233,22 +3700,21 @@ async def adm_status_set(cq: CallbackQuery, state: FSMContext):
     _,_,_,req_id,new_status = cq.data.split(":")
     info = REQ_INDEX.get(req_id)
     if not info: return await cq.answer("REQ_ID necunoscut.", show_alert=True)
-    info["status"]=new_status; REQ_INDEX[req_id]=info
+    info["status"]=new_status; REQ_INDEX[req_id]=info; reindex(req_id)
     update_order(req_id, status=new_status)
 
     # notifică devii
     for did in (info.get("assigned_dev_ids") or []):
-        try: await bot.send_message(did, f"ℹ️ Proiect #{req_id}: status → {new_status}")
-        except: pass
+        OUTBOX.submit(bot.send_message, did, f"ℹ️ Proiect #{req_id}: status → {new_status}", priority=PRIO_ADMIN)
 
     if new_status == "finalizat":
         if not can_payout(cq.from_user.id):
             await cq.message.edit_text(f"Status setat la finalizat. Așteaptă confirmarea OWNER.")
             return await cq.answer()
-        currency = (parse_amount_currency(info.get("budget_raw") or "")[1]) or "EUR"
+        amt_total, currency = parse_amount_currency(info.get("budget_raw") or "")
+        amt_total, currency = amt_total or 0, currency or "EUR"
         PAYOUT_CTX[cq.from_user.id] = {"req_id": req_id, "idx": 0, "devs": [], "amounts": {}, "currency": currency}
         devs=[]
-        amt_total = parse_amount_currency(info.get("budget_raw") or "")[0] or 0
         for did, meta in info.get("roles", {}).items():
             auto = round(amt_total * meta.get("pct",0)/100, 2)
             uname = CLAIMS.get(req_id, {}).get(did, {}).get("username","")
@@ -1261,10 +3727,8 @@ async def adm_status_set(cq: CallbackQuery, state: FSMContext):
             await state.set_state(AdminPayout.picking)
         return await cq.answer("Payout wizard pornit.")
     else:
-        try:
-            topic_id = info.get("topic_id") or None
-            await bot.send_message(DEV_GROUP_ID, f"🆔 {req_id}: status → <b>{new_status}</b>.", parse_mode="HTML", message_thread_id=topic_id)
-        except: pass
+        OUTBOX.submit(bot.send_message, DEV_GROUP_ID, f"🆔 {req_id}: status → <b>{new_status}</b>.", parse_mode="HTML",
+                      message_thread_id=info.get("topic_id") or None, priority=PRIO_GROUP)
         await cq.message.edit_text(f"✅ Status pentru {req_id} → {new_status}")
         return await cq.answer()
 
@@ -1297,22 +3761,17 @@ async def admin_payout_collect(m: Message, state: FSMContext):
         if comm > 0:
             append_earning(req_id, "ADMIN", "admin", comm, ctx["currency"], f"commission {ADMIN_COMMISSION_PCT}%")
         update_order(req_id, status="finalizat_confirmat")
-        REQ_INDEX[req_id]["status"] = "finalizat_confirmat"
+        REQ_INDEX[req_id]["status"] = "finalizat_confirmat"; reindex(req_id)
         await m.answer(f"✅ Plăți confirmate pentru #{req_id}. (comision {comm} {ctx['currency']})")
-        try:
-            topic = REQ_INDEX[req_id].get("topic_id") or None
-            await bot.send_message(DEV_GROUP_ID, f"🏁 {req_id}: proiect finalizat și plățile confirmate.", message_thread_id=topic)
-        except: pass
+        OUTBOX.submit(bot.send_message, DEV_GROUP_ID, f"🏁 {req_id}: proiect finalizat și plățile confirmate.",
+                      message_thread_id=REQ_INDEX[req_id].get("topic_id") or None, priority=PRIO_GROUP)
         PAYOUT_CTX.pop(m.from_user.id, None)
         await state.clear()
 
 # ==================== Detalii / Active ====================
 @rt.callback_query(F.data == "adm:details")
 async def adm_details_pick_req(cq: CallbackQuery):
-    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    req_ids = list(REQ_INDEX.keys())
-    if not req_ids: return await cq.answer("Nu există cereri.", show_alert=True)
-    await cq.message.edit_text("🧾 Alege cererea:", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=rid, callback_data=f"adm:details:req:{rid}") ] for rid in sorted(req_ids)]))
+    await show_picker(cq, "details")
 
 @rt.callback_query(F.data.startswith("adm:details:req:"))
 async def adm_details_show(cq: CallbackQuery):
@@ -1345,7 +3804,8 @@ async def adm_details_show(cq: CallbackQuery):
 @rt.callback_query(F.data == "adm:active")
 async def adm_active(cq: CallbackQuery):
     if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    actives=[(rid, inf) for rid,inf in REQ_INDEX.items() if (inf.get("status") or "nou") in {"nou","in_lucru"}]
+    ids, _, _ = page_req_ids(STATUS_INDEX.sources(ACTIVE_STATUSES), n=50)
+    actives=[(rid, REQ_INDEX[rid]) for rid in ids if rid in REQ_INDEX]
     if not actives:
         await cq.message.edit_text("Nu sunt proiecte active.")
         return await cq.answer()
@@ -1366,10 +3826,7 @@ async def adm_active(cq: CallbackQuery):
 # ==================== Comentarii ====================
 @rt.callback_query(F.data == "adm:comment")
 async def adm_comment_pick_req(cq: CallbackQuery, state: FSMContext):
-    if not is_admin(cq.from_user.id): return await cq.answer("Doar admin/manager.", show_alert=True)
-    req_ids = list(REQ_INDEX.keys())
-    if not req_ids: return await cq.answer("Nu există cereri.", show_alert=True)
-    await cq.message.edit_text("💬 Alege cererea:", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=rid, callback_data=f"adm:comment:req:{rid}") ] for rid in sorted(req_ids)]))
+    await show_picker(cq, "comment")
 
 @rt.callback_query(F.data.startswith("adm:comment:req:"))
 async def adm_comment_wait_note(cq: CallbackQuery, state: FSMContext):
@@ -1386,27 +3843,19 @@ async def comment_save(m: Message, state: FSMContext):
     note_txt = (m.text or "").strip()
     if not req_id:
         await state.clear(); return await m.answer("Context pierdut.")
-    prev = (REQ_INDEX.get(req_id, {}).get("notes") or "").strip()
     author = "admin" if is_admin(m.from_user.id) else fmt_username_from_parts(m.from_user.username or "", m.from_user.full_name or "", m.from_user.id)
     new_line = f"[{now_iso()}] ({author}) {note_txt}"
-    combined = (prev + "\n" + new_line).strip() if prev else new_line
-    if req_id in REQ_INDEX: REQ_INDEX[req_id]["notes"] = combined
-    update_order(req_id, notes=combined)
+    combined = append_order_note(req_id, new_line)   # citire + scriere sub lock: nu pierde note din alte procese
+    if combined is not None and req_id in REQ_INDEX: REQ_INDEX[req_id]["notes"] = combined
     await state.clear(); await m.answer(f"🗒️ Comentariu salvat pentru #{req_id}.")
     for did in (REQ_INDEX[req_id].get("assigned_dev_ids") or []):
-        try: await bot.send_message(did, f"💬 Comentariu nou la #{req_id}: {note_txt[:150]}")
-        except: pass
-    try:
-        topic_id = REQ_INDEX[req_id].get("topic_id") or None
-        await bot.send_message(DEV_GROUP_ID, f"💬 Comentariu la #{req_id}: {note_txt}", message_thread_id=topic_id)
-    except: pass
+        OUTBOX.submit(bot.send_message, did, f"💬 Comentariu nou la #{req_id}: {note_txt[:150]}", priority=PRIO_ADMIN)
+    OUTBOX.submit(bot.send_message, DEV_GROUP_ID, f"💬 Comentariu la #{req_id}: {note_txt}",
+                  message_thread_id=REQ_INDEX[req_id].get("topic_id") or None, priority=PRIO_GROUP)
 
 # ==================== Controale DEV ====================
 def ensure_assigned_dev(req_id: str, user_id: int) -> bool:
-    info = REQ_INDEX.get(req_id)
-    if not info: return False
-    ids = info.get("assigned_dev_ids") or set()
-    return str(user_id) in {str(x) for x in ids}
+    return DEV_INDEX.has(user_id, req_id)
 
 @rt.callback_query(F.data.startswith("dev:status:req:"))
 async def dev_status_pick(cq: CallbackQuery):
@@ -1423,12 +3872,10 @@ async def dev_status_set(cq: CallbackQuery):
     _,_,_,req_id,new_status = cq.data.split(":")
     if not ensure_assigned_dev(req_id, cq.from_user.id):
         return await cq.answer("Nu ești asignat.", show_alert=True)
-    REQ_INDEX[req_id]["status"]=new_status; update_order(req_id, status=new_status)
+    REQ_INDEX[req_id]["status"]=new_status; reindex(req_id); update_order(req_id, status=new_status)
     await cq.message.reply(f"✅ (dev) Status pentru {req_id} → {new_status}")
-    try:
-        topic_id = REQ_INDEX[req_id].get("topic_id") or None
-        await bot.send_message(DEV_GROUP_ID, f"🆔 {req_id}: status de dev → <b>{new_status}</b>.", parse_mode="HTML", message_thread_id=topic_id)
-    except: pass
+    OUTBOX.submit(bot.send_message, DEV_GROUP_ID, f"🆔 {req_id}: status de dev → <b>{new_status}</b>.", parse_mode="HTML",
+                  message_thread_id=REQ_INDEX[req_id].get("topic_id") or None, priority=PRIO_GROUP)
     await cq.answer("OK")
 
 @rt.callback_query(F.data.startswith("dev:comment:req:"))
@@ -1448,25 +3895,19 @@ async def dev_progress(cq: CallbackQuery):
         return await cq.answer("Nu ești asignat.", show_alert=True)
     p = int(p)
     note = f"Progres raportat: {p}%"
-    prev = (REQ_INDEX.get(req_id, {}).get("notes") or "").strip()
     new_line = f"[{now_iso()}] (dev {fmt_username_from_parts(cq.from_user.username or '', cq.from_user.full_name or '', cq.from_user.id)}) {note}"
-    combined = (prev + "\n" + new_line).strip() if prev else new_line
-    REQ_INDEX[req_id]["notes"] = combined; update_order(req_id, notes=combined)
-    try:
-        topic = REQ_INDEX[req_id].get("topic_id") or None
-        await bot.send_message(DEV_GROUP_ID, f"📈 #{req_id}: {note}", message_thread_id=topic)
-    except: pass
+    combined = append_order_note(req_id, new_line)
+    if combined is not None: REQ_INDEX[req_id]["notes"] = combined
+    OUTBOX.submit(bot.send_message, DEV_GROUP_ID, f"📈 #{req_id}: {note}",
+                  message_thread_id=REQ_INDEX[req_id].get("topic_id") or None, priority=PRIO_GROUP)
     await cq.answer("Progres salvat.")
 
 # /my: dashboard dev
 @rt.message(Command("my"))
 async def my_dashboard(m: Message):
     uid = m.from_user.id
-    active=[]; finished=[]
-    for rid, inf in REQ_INDEX.items():
-        if str(uid) not in {str(x) for x in (inf.get("assigned_dev_ids") or set())}: continue
-        st = inf.get("status","nou")
-        (active if st in {"nou","in_lucru"} else finished).append((rid, inf))
+    active = sorted(((rid, REQ_INDEX[rid]) for rid in DEV_INDEX.active(uid) if rid in REQ_INDEX),
+                    key=lambda x: (x[1].get("started_ts") or "", x[0]))
     total_money, cur, finished_count = dev_totals(uid)
 
     lines = ["👨‍💻 Dashboard", f"• Active: {len(active)}",
@@ -1508,32 +3949,129 @@ async def export_month(m: Message):
         return await m.answer("Format: /export_month YYYY-MM")
     start = datetime.date(year, month, 1)
     end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
-    rows = [r for r in load_log() if r.get("ts","") and start.isoformat() <= r["ts"][:10] < end.isoformat()]
+    rows = STORE.between(start.isoformat(), end.isoformat())
     out = pathlib.Path(f"export_{ym}.csv")
     with out.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=FIELDNAMES); w.writeheader()
         for r in rows: w.writerow(r)
     await m.answer_document(FSInputFile(out), caption=f"Export {ym}")
 
+# ==================== Joburi programate ====================
+# Scheduler pe heap: fiecare job are o expresie cron („m h dom mon dow”, ora locală);
+# bucla doarme exact până la următorul job scadent. Ultima rulare a fiecărui job e salvată
+# în SCHED_PATH, deci un restart în fereastra de rulare nu mai trimite duplicate.
+SCHED_PATH = pathlib.Path(os.getenv("SCHED_PATH", "scheduler_state.json"))
+SCHED_MAX_SLEEP = 3600   # s; re-verifică periodic ca să prindă salturile de ceas (NTP, suspend)
+
+class CronSpec:
+    """Subset cron: `*`, `n`, `a-b`, `*/k`, `a-b/k`, `n/k` (= n-max/k), liste cu virgulă. dow: 0/7 = duminică."""
+    BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr: str):
+        parts = expr.split()
+        if len(parts) != 5: raise ValueError(f"cron invalid: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.dom, self.months, dow = (
+            self._field(p, lo, hi) for p, (lo, hi) in zip(parts, self.BOUNDS))
+        self.dow = {d % 7 for d in dow}
+        self.dom_any, self.dow_any = parts[2] == "*", parts[4] == "*"
+        self.hm = [(h, mi) for h in sorted(self.hours) for mi in sorted(self.minutes)]
+
+    @staticmethod
+    def _field(part: str, lo: int, hi: int) -> set:
+        out = set()
+        for chunk in part.split(","):
+            rng, _, step = chunk.partition("/")
+            if rng == "*": a, b = lo, hi
+            elif "-" in rng: a, b = (int(x) for x in rng.split("-", 1))
+            else:
+                a = int(rng); b = hi if step else a   # „5/15” = 5,20,35,50
+            if not (lo <= a <= b <= hi): raise ValueError(f"cron: {chunk!r} în afara [{lo}, {hi}]")
+            out.update(range(a, b + 1, int(step) if step else 1))
+        return out
+
+    def _day_ok(self, d: datetime.date) -> bool:
+        if d.month not in self.months: return False
+        dom_ok = d.day in self.dom
+        dow_ok = (d.weekday() + 1) % 7 in self.dow
+        if self.dom_any or self.dow_any: return dom_ok and dow_ok   # semantica cron: OR doar dacă ambele sunt restrânse
+        return dom_ok or dow_ok
+
+    def next_after(self, dt: datetime.datetime) -> datetime.datetime:
+        start = dt.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):
+            if self._day_ok(day):
+                for h, mi in self.hm:
+                    cand = datetime.datetime.combine(day, datetime.time(h, mi))
+                    if cand >= start: return cand
+            day += datetime.timedelta(days=1)
+        raise ValueError(f"cron fără apariții: {self.expr!r}")
+
+class JobScheduler:
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.jobs = {}     # {name: (CronSpec, fn, grace_s)}
+        self.heap = []     # (due: datetime, name)
+        self.last = {}     # {name: iso ultima rulare}
+
+    def add(self, name: str, expr: str, fn, grace: float = 3600):
+        """`fn` = corutină fără argumente. O rulare ratată (bot oprit) se recuperează
+        la pornire doar dacă a întârziat cel mult `grace` secunde."""
+        self.jobs[name] = (CronSpec(expr), fn, grace)
+
+    def _load(self):
+        try: self.last = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError): self.last = {}
+
+    def _save(self):
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.last), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _first_due(self, name: str, now: datetime.datetime) -> datetime.datetime:
+        spec, _fn, grace = self.jobs[name]
+        last = self.last.get(name)
+        if last:
+            due = spec.next_after(datetime.datetime.fromisoformat(last))
+            if (now - due).total_seconds() <= grace: return due   # în viitor sau ratat de curând
+        return spec.next_after(now)
+
+    async def run(self):
+        self._load()
+        now = datetime.datetime.now()
+        self.heap = [(self._first_due(name, now), name) for name in self.jobs]
+        heapq.heapify(self.heap)
+        while self.heap:
+            due, name = self.heap[0]
+            delay = (due - datetime.datetime.now()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, SCHED_MAX_SLEEP))
+                continue
+            heapq.heappop(self.heap)
+            spec, fn, _grace = self.jobs[name]
+            # markerul se scrie înainte de rulare: la crash în timpul jobului preferăm zero trimiteri, nu dublură
+            self.last[name] = due.isoformat(timespec="minutes"); self._save()
+            try:
+                await fn()
+            except Exception as e:
+                print(f"[E] job {name}:", repr(e))
+            heapq.heappush(self.heap, (spec.next_after(max(due, datetime.datetime.now())), name))
+
+SCHEDULER = JobScheduler(SCHED_PATH)
+
 # ==================== Weekly summary ====================
+def weekly_summary_rows():
+    """{dev_id: nr. proiecte active}, direct din DEV_INDEX."""
+    return {did: len(DEV_INDEX.active(did)) for did in DEV_INDEX.devs()}
+
 async def weekly_summaries():
-    sent_for = set()
-    while True:
-        now = datetime.datetime.now()
-        if now.weekday()==0 and now.hour==9 and (now.minute<2):  # Luni 09:00
-            key = now.strftime("%Y-%m-%d")
-            if key not in sent_for:
-                dev_ids=set()
-                for _, inf in REQ_INDEX.items():
-                    for did in (inf.get("assigned_dev_ids") or []): dev_ids.add(did)
-                for did in dev_ids:
-                    active=[(rid,inf) for rid,inf in REQ_INDEX.items() if str(did) in {str(x) for x in (inf.get("assigned_dev_ids") or set())} and (inf.get("status") or "nou") in {"nou","in_lucru"}]
-                    total, cur, fin = dev_totals(did)
-                    lines = [f"📬 Rezumat săptămânal", f"• Active: {len(active)}", f"• Finalizate confirmate: {fin}", f"• Total confirmat: {total:.2f} {cur}"]
-                    try: await bot.send_message(did, "\n".join(lines))
-                    except: pass
-                sent_for.add(key)
-        await asyncio.sleep(60)
+    for did, n_active in weekly_summary_rows().items():
+        total, cur, fin = dev_totals(did)
+        lines = [f"📬 Rezumat săptămânal", f"• Active: {n_active}", f"• Finalizate confirmate: {fin}", f"• Total confirmat: {total:.2f} {cur}"]
+        OUTBOX.submit(bot.send_message, did, "\n".join(lines), priority=PRIO_BULK)
+
+SCHEDULER.add("weekly_summaries", os.getenv("WEEKLY_SUMMARY_CRON", "0 9 * * 1"), weekly_summaries)   # Luni 09:00
 
 # ==================== Utilitare ====================
 @rt.message(Command("catalog"))
@@ -1552,10 +4090,76 @@ async def whoami(m: Message):
 # ==================== Run ====================
 dp.include_router(rt)
 
+_first_update_seen = False
+
+@dp.update.outer_middleware()
+async def first_update_probe(handler, event, data):
+    global _first_update_seen
+    if not _first_update_seen:
+        _first_update_seen = True
+        print(f"[I] time-to-first-update: {time.perf_counter() - BOOT_T0:.2f} s de la pornire")
+    return await handler(event, data)
+
+async def on_update_error(event: ErrorEvent):
+    # în webhook update-urile rulează în task-uri separate: fără asta, excepțiile ajung doar ca
+    # „Task exception was never retrieved”; în polling aiogram le loghează deja, cu traceback
+    upd = event.update
+    print(f"[E] update {upd.update_id} ({upd.event_type}):", repr(event.exception))
+    traceback.print_exception(event.exception)
+    return True
+
+if RUN_MODE == "webhook":
+    dp.errors.register(on_update_error)
+
+def build_webhook_app() -> web.Application:
+    """aiohttp app: POST pe WEBHOOK_PATH întoarce 200 imediat, update-ul e procesat într-un task separat."""
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, handle_in_background=True,
+                         secret_token=WEBHOOK_SECRET or None).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook():
+    runner = web.AppRunner(build_webhook_app())
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    if WEBHOOK_URL:
+        await bot.set_webhook(WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None,
+                              allowed_updates=ALLOWED_UPDATES)
+    print(f"[I] webhook: ascult pe {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+          + (f", setat la {WEBHOOK_URL}" if WEBHOOK_URL else " (webhook-ul nu e setat de bot)"))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
 async def main():
     print("Bot – multi-dev, topics, payouts, export, notificări + categorii & idei.")
-    asyncio.create_task(weekly_summaries())
-    await dp.start_polling(bot, allowed_updates=["message", "callback_query"])
+    hydrate_state()
+    WRITER.start()
+    # referințe ținute (altfel task-urile pot fi colectate de GC); oprite și așteptate la shutdown
+    daemons = [asyncio.create_task(SCHEDULER.run()), asyncio.create_task(media_startup())]
+    metrics = await start_metrics_server()
+    print(f"[I] gata de update-uri după {time.perf_counter() - BOOT_T0:.2f} s")
+    try:
+        if RUN_MODE == "webhook":
+            await run_webhook()
+        else:
+            await dp.start_polling(bot, allowed_updates=ALLOWED_UPDATES)
+    finally:
+        for t in daemons: t.cancel()
+        await asyncio.gather(*daemons, return_exceptions=True)
+        if BG_TASKS: await asyncio.gather(*BG_TASKS, return_exceptions=True)
+        await WRITER.close()
+        if TRACE_PATH: await flush_traces()
+        if metrics: await metrics.cleanup()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if "--import-csv" in sys.argv:   # python main.py --import-csv  (migrare CSV -> SQLite)
+        import_csv_to_sqlite()
+    elif "--backfill-orders" in sys.argv:   # python main.py --backfill-orders [--dry-run]
+        backfill_orders(dry_run="--dry-run" in sys.argv)
+    elif "--preprocess-media" in sys.argv:
+        print(f"[I] preview-uri media: {PREVIEWS.run()} fișiere procesate")
+    else:
+        asyncio.run(main())